@@ -0,0 +1,233 @@
+# Calendar-aligned comparison of station usage across years.
+#
+# year_comparison.py compares calendar-year means, but academic weeks drift between years
+# (reading week 2022 starts 2022-03-07, reading week 2023 starts 2023-03-06). Here each day is
+# aligned to its academic block, the week within that block (counted from the Monday of the
+# block's first week) and its weekday, using the calendar ranges in
+# availability_by_academic_period.py. So e.g. the Tuesday of reading week 2022 is paired with the
+# Tuesday of reading week 2023 even when the two blocks start on different weekdays; days with no
+# counterpart in the other year stay NaN and drop out of the pairing.
+#
+# Daily station means are laid out as one array of shape (year, station, aligned day), and the
+# paired differences, effect sizes (Cohen's d_z) and paired t statistics are computed for every
+# year pair, station and block with array operations. Adding a year means adding its dates to
+# ALIGNED_BLOCKS below; consecutive-year comparisons grow linearly with the number of years.
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import availability_by_academic_period as cal
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+INPUT_CSV = "combined_cleaned.csv"
+
+NEAR_EMPTY_THRESHOLD = cal.NEAR_EMPTY_THRESHOLD
+NEAR_FULL_THRESHOLD = cal.NEAR_FULL_THRESHOLD
+
+# Academic blocks that recur every year, keyed by the calendar year the block starts in.
+# (preterm_study_2023 and revision_2023 have no 2022 counterpart, so they are not aligned.)
+ALIGNED_BLOCKS = {
+    "scholarship_exam": {2022: cal.scholarship_2022, 2023: cal.scholarship_2023},
+    "hilary_teaching_1": {2022: cal.teaching_2022_block1, 2023: cal.teaching_2023_block1},
+    "hilary_reading_week": {2022: cal.reading_week_2022, 2023: cal.reading_week_2023},
+    "hilary_teaching_2": {2022: cal.teaching_2022_block2, 2023: cal.teaching_2023_block2},
+    "summer_exam": {2022: cal.summer_exams_2022, 2023: cal.summer_exams_2023},
+    "term_end": {2022: cal.term_end_2022, 2023: cal.term_end_2023},
+    "summer": {2022: cal.summer_2022, 2023: cal.summer_2023},
+    "michaelmas_teaching_1": {2022: cal.teaching_2022_2023_block1, 2023: cal.teaching_2023_2024_block1},
+    "michaelmas_reading_week": {2022: cal.reading_week_2022_2023, 2023: cal.reading_week_2023_2024},
+    "michaelmas_teaching_2": {2022: cal.teaching_2022_2023_block2, 2023: cal.teaching_2023_2024_block2},
+    "christmas_exam": {2022: cal.christmas_exams_2022, 2023: cal.christmas_exams_2023},
+    "christmas_closure": {2022: cal.christmas_closure_2022, 2023: cal.christmas_closure_2023},
+}
+
+BLOCK_ORDER = list(ALIGNED_BLOCKS)
+
+METRICS = ("frac_not_docked", "near_empty", "near_full")
+
+
+def aligned_calendar() -> pd.DataFrame:
+    """One row per calendar date: academic year, block, week within the block and weekday."""
+    rows = []
+    for block, years in ALIGNED_BLOCKS.items():
+        for year, dates in years.items():
+            first_monday = dates[0] - pd.Timedelta(days=dates[0].weekday())
+            for d in dates:
+                rows.append((d, year, block, (d - first_monday).days // 7, d.weekday()))
+    calendar = pd.DataFrame(rows, columns=["date", "academic_year", "block", "week", "weekday"])
+    calendar["date"] = pd.to_datetime(calendar["date"])
+    return calendar
+
+
+def daily_station_means(df: pd.DataFrame, metric: str = "frac_not_docked") -> pd.DataFrame:
+    df = df.copy()
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    df["date"] = df["TIME"].dt.normalize()
+    if metric == "frac_not_docked":
+        df[metric] = (df["BIKE_STANDS"] - df["AVAILABLE_BIKES"]) / df["BIKE_STANDS"]
+    elif metric == "near_empty":
+        df[metric] = df["AVAILABLE_BIKES"] <= NEAR_EMPTY_THRESHOLD
+    elif metric == "near_full":
+        df[metric] = df["AVAILABLE_BIKE_STANDS"] <= NEAR_FULL_THRESHOLD
+    else:
+        raise ValueError(f"metric must be one of {METRICS}")
+    return df.groupby(["STATION ID", "date"])[metric].mean().rename("value").reset_index()
+
+
+def aligned_array(daily: pd.DataFrame, calendar: pd.DataFrame):
+    """
+    Daily means as an array of shape (year, station, aligned day), NaN where a station has no
+    data. Returns the array with its year, station and (block, week, weekday) labels.
+    """
+    merged = daily.merge(calendar, on="date", how="inner")
+    slots = calendar[["block", "week", "weekday"]].drop_duplicates()
+    slots = slots.assign(order=slots["block"].map(BLOCK_ORDER.index)).sort_values(["order", "week", "weekday"])
+    slots = slots.drop(columns="order").reset_index(drop=True)
+
+    years = np.array(sorted(calendar["academic_year"].unique()))
+    stations = np.array(sorted(daily["STATION ID"].unique()))
+    slot_index = pd.MultiIndex.from_frame(slots)
+
+    y = np.searchsorted(years, merged["academic_year"].to_numpy())
+    s = np.searchsorted(stations, merged["STATION ID"].to_numpy())
+    k = slot_index.get_indexer(pd.MultiIndex.from_frame(merged[["block", "week", "weekday"]]))
+
+    values = np.full((len(years), len(stations), len(slots)), np.nan)
+    values[y, s, k] = merged["value"].to_numpy()
+    return values, years, stations, slots
+
+
+def year_pairs(years, mode: str = "consecutive"):
+    """Index pairs (a, b) of years to compare: each year vs the previous, the first, or all."""
+    n = len(years)
+    if mode == "consecutive":
+        return [(i, i + 1) for i in range(n - 1)]
+    if mode == "baseline":
+        return [(0, i) for i in range(1, n)]
+    return [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+
+def paired_differences(values: np.ndarray, pairs, block_codes: np.ndarray, n_blocks: int):
+    """
+    Paired statistics for every (year pair, station, block) in one pass.
+
+    block_codes maps each aligned day to its block; an extra "all" block covers every day.
+    Returns a dict of arrays of shape (pair, station, block + 1).
+    """
+    a_idx = np.array([a for a, _ in pairs], dtype=int)
+    b_idx = np.array([b for _, b in pairs], dtype=int)
+    a, b = values[a_idx], values[b_idx]                         # (pair, station, day)
+    both = np.isfinite(a) & np.isfinite(b)
+    diff = np.where(both, b - a, 0.0)
+
+    # Block membership, plus a final row selecting every day
+    membership = np.zeros((n_blocks + 1, values.shape[-1]))
+    membership[block_codes, np.arange(values.shape[-1])] = 1
+    membership[-1] = 1
+
+    n = both.astype(float) @ membership.T                       # (pair, station, block)
+    sum_diff = diff @ membership.T
+    sum_sq = (diff ** 2) @ membership.T
+    sum_a = np.where(both, a, 0.0) @ membership.T
+    sum_b = np.where(both, b, 0.0) @ membership.T
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_diff = sum_diff / n
+        var_diff = (sum_sq - n * mean_diff ** 2) / (n - 1)
+        sd_diff = np.sqrt(np.clip(var_diff, 0, None))
+        effect_size = mean_diff / sd_diff
+        t_stat = mean_diff / (sd_diff / np.sqrt(n))
+
+    return {
+        "n_pairs": n.astype(int),
+        "mean_a": sum_a / np.where(n > 0, n, np.nan),
+        "mean_b": sum_b / np.where(n > 0, n, np.nan),
+        "mean_diff": mean_diff,
+        "sd_diff": sd_diff,
+        "effect_size": effect_size,
+        "t_stat": t_stat,
+    }
+
+
+def compare_years(df: pd.DataFrame, metric: str = "frac_not_docked", pairs: str = "consecutive") -> pd.DataFrame:
+    """Long table of paired per-station differences for every year pair and academic block."""
+    calendar = aligned_calendar()
+    values, years, stations, slots = aligned_array(daily_station_means(df, metric), calendar)
+    pair_idx = year_pairs(years, pairs)
+    if not pair_idx:
+        return pd.DataFrame()
+
+    block_codes = slots["block"].map(BLOCK_ORDER.index).to_numpy()
+    stats = paired_differences(values, pair_idx, block_codes, len(BLOCK_ORDER))
+
+    # Flatten (pair, station, block) into rows
+    n_pairs, n_stations, n_blocks = stats["n_pairs"].shape
+    p, s, k = np.meshgrid(np.arange(n_pairs), np.arange(n_stations), np.arange(n_blocks), indexing="ij")
+    blocks = np.array(BLOCK_ORDER + ["all"])
+    result = pd.DataFrame({
+        "year_a": years[[pair_idx[i][0] for i in p.ravel()]],
+        "year_b": years[[pair_idx[i][1] for i in p.ravel()]],
+        "STATION ID": stations[s.ravel()],
+        "block": blocks[k.ravel()],
+        **{name: arr.ravel() for name, arr in stats.items()},
+    })
+    result.insert(0, "metric", metric)
+    return result[result["n_pairs"] > 0].reset_index(drop=True)
+
+
+def plot_effect_sizes(result: pd.DataFrame, year_a: int, year_b: int, filename: str):
+    import matplotlib.pyplot as plt
+
+    subset = result[(result["year_a"] == year_a) & (result["year_b"] == year_b) & (result["block"] != "all")]
+    pivot = subset.pivot(index="block", columns="STATION ID", values="effect_size")
+    pivot = pivot.reindex([b for b in BLOCK_ORDER if b in pivot.index])
+
+    ax = pivot.plot(kind="bar", figsize=(12, 6))
+    ax.axhline(0, color="black", linewidth=0.8)
+    ax.set_title(f"Calendar-aligned change in {result['metric'].iloc[0]}: {year_b} vs {year_a} (paired effect size)")
+    ax.set_ylabel("Cohen's d_z (paired by academic day)")
+    ax.set_xlabel("")
+    ax.legend(title="Station ID")
+    plt.tight_layout()
+    os.makedirs("graphs", exist_ok=True)
+    plt.savefig(os.path.join("graphs", filename))
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calendar-aligned multi-year comparison")
+    parser.add_argument("--metric", choices=METRICS, default="frac_not_docked")
+    parser.add_argument("--pairs", choices=["consecutive", "baseline", "all"], default="consecutive")
+    add_anomaly_arguments(parser)
+    args = parse_export_args(parser=parser)
+
+    df = pd.read_csv(INPUT_CSV)
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+
+    result = compare_years(df, args.metric, args.pairs)
+
+    overall = result[result["block"] == "all"]
+    for _, row in overall.iterrows():
+        print(
+            f"Station {row['STATION ID']}: {row['year_b']} vs {row['year_a']} "
+            f"mean diff={row['mean_diff']:+.3f}, d_z={row['effect_size']:+.2f}, n={row['n_pairs']}"
+        )
+
+    if args.export:
+        export_tables({f"academic_year_comparison_{args.metric}": result}, args.export)
+    if args.headless:
+        return
+
+    for (year_a, year_b), _ in result.groupby(["year_a", "year_b"]):
+        filename = f"academic_aligned_{args.metric}_{year_b}_vs_{year_a}.png"
+        plot_effect_sizes(result, year_a, year_b, filename)
+        print(f"Saved graph: graphs/{filename}")
+
+
+if __name__ == "__main__":
+    main()
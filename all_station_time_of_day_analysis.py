@@ -1,82 +1,152 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-
-# -----------------------------
-# Load data
-# -----------------------------
-df = pd.read_csv("combined_cleaned_near_accommodation.csv")
-
-# -----------------------------
-# Select years (combine 2022 and 2023)
-# -----------------------------
-years = [2022, 2023]
-df = df[df["YEAR"].isin(years)]
-
-# Convert TIME column to datetime
-df["TIME"] = pd.to_datetime(df["TIME"])
-
-# -----------------------------
-# Fraction of bikes docked
-# -----------------------------
-df["frac_docked"] = df["AVAILABLE_BIKES"] / df["BIKE_STANDS"]
-
-# -----------------------------
-# Extract 30-minute time-of-day slot
-# -----------------------------
-df["time_of_day"] = df["TIME"].dt.strftime("%H:%M")
-
-# -----------------------------
-# Compute mean + variance across stations
-# -----------------------------
-# Group by time-of-day AND station
-station_time = df.groupby(["time_of_day", "STATION ID"])["frac_docked"].mean()
-
-# Now compute mean + variance across stations for each time slot
-mean_frac = station_time.groupby("time_of_day").mean().sort_index()
-variance_frac = station_time.groupby("time_of_day").var().sort_index()
-
-# Reorder time-of-day from 05:00 -> 04:30 (next day)
-times = pd.date_range(
-    "2000-01-01 05:00",
-    "2000-01-02 04:30",
-    freq="30min"
-)
-desired_order = times.strftime("%H:%M")
-
-mean_frac = mean_frac.reindex(desired_order)
-variance_frac = variance_frac.reindex(desired_order)
-
-# -----------------------------
-# Plotting (Histogram with Variance Bars)
-# -----------------------------
-fig, ax = plt.subplots(figsize=(14, 6))
-
-ax.bar(
-    mean_frac.index,
-    mean_frac.values,
-    yerr=variance_frac.values,
-    capsize=4,
-    width=0.8,
-    color="skyblue",
-    edgecolor="black"
-)
 
-ax.set_xlabel("Time of Day (30-minute intervals)")
-ax.set_ylabel("Mean Fraction of Bikes Docked")
-ax.set_title(
-    "Mean Fraction of Bikes Docked Across Stations Near Accommodation by Time of Day - 2022/2023 combined\n"
-    "with variance between stations"
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+from approximate_queries import (
+    add_approximate_arguments,
+    add_strata_columns,
+    slot_label,
+    StratifiedSample,
+    stratified_estimates,
+    run_approximate,
+    describe_sample,
 )
 
-ax.set_ylim(0, 0.7)
-plt.xticks(rotation=90)
-plt.tight_layout()
 
-# Save graph
-os.makedirs("graphs", exist_ok=True)
-path = "graphs/all_stations_mean_fraction_docked_near_accommodation_2022_2023_combined_adjusted.png"
-fig.savefig(path)
-plt.close(fig)
+def mean_fraction_across_stations(df: pd.DataFrame, years) -> pd.DataFrame:
+    # -----------------------------
+    # Select years (combine 2022 and 2023)
+    # -----------------------------
+    df = df[df["YEAR"].isin(years)].copy()
+
+    # Convert TIME column to datetime
+    df["TIME"] = pd.to_datetime(df["TIME"])
+
+    # -----------------------------
+    # Fraction of bikes docked
+    # -----------------------------
+    df["frac_docked"] = df["AVAILABLE_BIKES"] / df["BIKE_STANDS"]
+
+    # -----------------------------
+    # Extract 30-minute time-of-day slot
+    # -----------------------------
+    df["time_of_day"] = df["TIME"].dt.strftime("%H:%M")
+
+    # -----------------------------
+    # Compute mean + variance across stations
+    # -----------------------------
+    # Group by time-of-day AND station
+    station_time = df.groupby(["time_of_day", "STATION ID"])["frac_docked"].mean()
+
+    # Now compute mean + variance across stations for each time slot
+    mean_frac = station_time.groupby("time_of_day").mean().sort_index()
+    variance_frac = station_time.groupby("time_of_day").var().sort_index()
+
+    # Reorder time-of-day from 05:00 -> 04:30 (next day)
+    times = pd.date_range(
+        "2000-01-01 05:00",
+        "2000-01-02 04:30",
+        freq="30min"
+    )
+    desired_order = times.strftime("%H:%M")
+
+    return pd.DataFrame({
+        "mean_frac_docked": mean_frac.reindex(desired_order),
+        "variance_between_stations": variance_frac.reindex(desired_order),
+    }).rename_axis("time_of_day")
+
+
+def approximate_mean_fraction_across_stations(df: pd.DataFrame, years, args) -> pd.DataFrame:
+    # Per-station slot means estimated from a stratified sample, then averaged across stations
+    # as in mean_fraction_across_stations; the half-width covers the sampling error of that mean
+    sampler = StratifiedSample(add_strata_columns(df[df["YEAR"].isin(years)]), seed=args.seed)
+
+    def estimate(sample):
+        sample = sample.assign(
+            frac_docked=sample["AVAILABLE_BIKES"] / sample["BIKE_STANDS"],
+            time_of_day=slot_label(sample["slot"]),
+        )
+        station_time = stratified_estimates(sample, "frac_docked", ["time_of_day", "STATION ID"], sampler.sizes)
+        station_time["sampling_var"] = station_time["se"] ** 2
+        grouped = station_time.groupby("time_of_day")
+        profile = pd.DataFrame({
+            "mean_frac_docked": grouped["estimate"].mean(),
+            "variance_between_stations": grouped["estimate"].var(),
+            "half_width": 1.96 * grouped["sampling_var"].sum() ** 0.5 / grouped.size(),
+        })
+        return {"profile": profile}
+
+    estimates, info = run_approximate(sampler, estimate, args.target_error, args.time_budget, args.sample_fraction)
+    print(describe_sample(info, args.target_error))
+
+    times = pd.date_range("2000-01-01 05:00", "2000-01-02 04:30", freq="30min")
+    return estimates["profile"].reindex(times.strftime("%H:%M")).rename_axis("time_of_day")
+
+
+def plot_mean_fraction(profile: pd.DataFrame) -> str:
+    import matplotlib.pyplot as plt
+
+    # -----------------------------
+    # Plotting (Histogram with Variance Bars)
+    # -----------------------------
+    fig, ax = plt.subplots(figsize=(14, 6))
+
+    ax.bar(
+        profile.index,
+        profile["mean_frac_docked"].values,
+        yerr=profile["variance_between_stations"].values,
+        capsize=4,
+        width=0.8,
+        color="skyblue",
+        edgecolor="black"
+    )
+
+    ax.set_xlabel("Time of Day (30-minute intervals)")
+    ax.set_ylabel("Mean Fraction of Bikes Docked")
+    ax.set_title(
+        "Mean Fraction of Bikes Docked Across Stations Near Accommodation by Time of Day - 2022/2023 combined\n"
+        "with variance between stations"
+    )
+
+    ax.set_ylim(0, 0.7)
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+
+    # Save graph
+    os.makedirs("graphs", exist_ok=True)
+    path = "graphs/all_stations_mean_fraction_docked_near_accommodation_2022_2023_combined_adjusted.png"
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Mean fraction docked by time of day across stations"))
+    add_approximate_arguments(parser)
+    args = parse_export_args(parser=parser)
+
+    # -----------------------------
+    # Load data
+    # -----------------------------
+    df = pd.read_csv("combined_cleaned_near_accommodation.csv")
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+
+    if args.approximate:
+        profile = approximate_mean_fraction_across_stations(df, [2022, 2023], args)
+    else:
+        profile = mean_fraction_across_stations(df, years=[2022, 2023])
+
+    if args.export:
+        export_tables({"all_stations_mean_fraction_docked_near_accommodation": profile}, args.export)
+    if args.headless:
+        return
+
+    path = plot_mean_fraction(profile)
+    print(f"Saved system-wide histogram with variance bars: {path}")
+
 
-print(f"Saved system-wide histogram with variance bars: {path}")
+if __name__ == "__main__":
+    main()
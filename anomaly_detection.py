@@ -0,0 +1,158 @@
+# Flag anomalous station-days (closures, outages, events) against a rolling robust baseline.
+#
+# Each station's data is laid out as daily profiles of mean fraction docked per 30-minute slot,
+# giving one array of shape (station, slot, week, weekday). For every station x slot x weekday the
+# baseline is the rolling median of the surrounding weeks and the spread is the rolling MAD, both
+# taken over a sliding window view of the week axis, so every station and year is scored in one
+# vectorized pass. A station-day is anomalous when a large share of its slots sit far outside the
+# baseline, or when most of its snapshots are missing.
+#
+#     python anomaly_detection.py [combined csv] [--export json]
+#
+# The analysis scripts accept --exclude-anomalies to drop flagged station-days before aggregating.
+
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from table_export import EXPORT_FORMATS, export_tables
+
+INPUT_CSV = "combined_cleaned.csv"
+
+SLOTS_PER_DAY = 48          # 30-minute slots
+WINDOW_WEEKS = 9            # centred window of same-weekday observations (4 weeks either side)
+Z_THRESHOLD = 3.5           # robust z-score beyond which a slot is an outlier
+MIN_OUTLIER_FRACTION = 0.5  # share of a day's slots that must be outliers to flag the day
+MIN_COVERAGE = 0.5          # days with fewer observed slots than this are flagged as outages
+MIN_MAD = 0.02              # floor on the MAD (fraction of stands) so flat baselines don't explode
+MAD_SCALE = 1.4826          # makes the MAD a consistent estimator of the standard deviation
+
+
+def daily_profiles(df: pd.DataFrame):
+    """
+    Mean fraction docked per station, slot and day as an array of shape
+    (station, slot, week, weekday), padded with NaN so the day axis starts on a Monday.
+    """
+    slot_time = pd.to_datetime(df["TIME"]).dt.round("30min")
+    day = slot_time.dt.normalize()
+    first_monday = day.min() - pd.Timedelta(days=int(day.min().weekday()))
+
+    station_codes, stations = pd.factorize(df["STATION ID"], sort=True)
+    day_idx = ((day - first_monday).dt.days).to_numpy()
+    slot_idx = (slot_time.dt.hour * 2 + slot_time.dt.minute // 30).to_numpy()
+    n_weeks = int(day_idx.max()) // 7 + 1
+
+    frac = (df["AVAILABLE_BIKES"] / df["BIKE_STANDS"]).to_numpy(dtype=float)
+    valid = np.isfinite(frac)
+
+    shape = (len(stations), SLOTS_PER_DAY, n_weeks * 7)
+    flat = np.ravel_multi_index((station_codes[valid], slot_idx[valid], day_idx[valid]), shape)
+    sums = np.bincount(flat, weights=frac[valid], minlength=np.prod(shape))
+    counts = np.bincount(flat, minlength=np.prod(shape))
+    with np.errstate(invalid="ignore"):
+        profiles = (sums / counts).reshape(shape)
+
+    days = pd.date_range(first_monday, periods=n_weeks * 7, freq="D")
+    return profiles.reshape(len(stations), SLOTS_PER_DAY, n_weeks, 7), np.asarray(stations), days
+
+
+def rolling_robust_z(profiles: np.ndarray, window_weeks: int = WINDOW_WEEKS) -> np.ndarray:
+    """Robust z-scores against a centred rolling median / MAD along the week axis."""
+    half = window_weeks // 2
+    padded = np.pad(profiles, [(0, 0), (0, 0), (half, half), (0, 0)], constant_values=np.nan)
+    # (station, slot, week, weekday, window) view; no data is copied until the reductions
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window_weeks, axis=2)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows at the edges of the data
+        median = np.nanmedian(windows, axis=-1)
+        mad = np.nanmedian(np.abs(windows - median[..., None]), axis=-1)
+    return (profiles - median) / np.maximum(MAD_SCALE * mad, MIN_MAD)
+
+
+def flag_anomalous_days(
+    df: pd.DataFrame,
+    window_weeks: int = WINDOW_WEEKS,
+    z_threshold: float = Z_THRESHOLD,
+    min_outlier_fraction: float = MIN_OUTLIER_FRACTION,
+    min_coverage: float = MIN_COVERAGE,
+) -> pd.DataFrame:
+    """One row per station-day with its outlier share, coverage and anomalous flag."""
+    profiles, stations, days = daily_profiles(df)
+    z = rolling_robust_z(profiles, window_weeks)
+
+    observed = np.isfinite(profiles).sum(axis=1)                    # (station, week, weekday)
+    outliers = (np.abs(np.nan_to_num(z)) > z_threshold).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        outlier_fraction = np.where(observed > 0, outliers / observed, np.nan)
+        max_abs_z = np.nanmax(np.where(np.isfinite(z), np.abs(z), -np.inf), axis=1)
+
+    n_stations = len(stations)
+    observed = observed.reshape(n_stations, -1)
+
+    # Keep only days within each station's observed date range (drops the Monday padding)
+    seen = observed > 0
+    first = seen.argmax(axis=1)
+    last = seen.shape[1] - 1 - seen[:, ::-1].argmax(axis=1)
+    day_pos = np.arange(seen.shape[1])
+    in_range = ((day_pos >= first[:, None]) & (day_pos <= last[:, None])).ravel()
+
+    flags = pd.DataFrame({
+        "STATION ID": np.repeat(stations, len(days)),
+        "date": np.tile(days.date, n_stations),
+        "observed_slots": observed.ravel(),
+        "outlier_fraction": outlier_fraction.reshape(n_stations, -1).ravel(),
+        "max_abs_z": max_abs_z.reshape(n_stations, -1).ravel(),
+    })[in_range].reset_index(drop=True)
+    flags["max_abs_z"] = flags["max_abs_z"].replace(-np.inf, np.nan)
+
+    coverage = flags["observed_slots"] / SLOTS_PER_DAY
+    flags["reason"] = np.select(
+        [coverage < min_coverage, flags["outlier_fraction"] >= min_outlier_fraction],
+        ["missing_data", "profile_outlier"],
+        default="",
+    )
+    flags["anomalous"] = flags["reason"] != ""
+    return flags
+
+
+def drop_anomalous_days(df: pd.DataFrame, flags: pd.DataFrame = None) -> pd.DataFrame:
+    """Remove every snapshot belonging to a flagged station-day."""
+    if flags is None:
+        flags = flag_anomalous_days(df)
+    bad = flags.loc[flags["anomalous"], ["STATION ID", "date"]]
+    # Same day assignment as daily_profiles (snapshots rounded to the nearest slot)
+    day = pd.to_datetime(df["TIME"]).dt.round("30min").dt.date
+    keys = pd.MultiIndex.from_arrays([df["STATION ID"], day])
+    bad_keys = pd.MultiIndex.from_frame(bad)
+    return df[~keys.isin(bad_keys)].copy()
+
+
+def add_anomaly_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument(
+        "--exclude-anomalies",
+        action="store_true",
+        help="drop station-days flagged by anomaly_detection.py before aggregating",
+    )
+    return parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag anomalous station-days")
+    parser.add_argument("input_csv", nargs="?", default=INPUT_CSV)
+    parser.add_argument("--export", choices=sorted(EXPORT_FORMATS), default="csv")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input_csv)
+    flags = flag_anomalous_days(df)
+
+    anomalous = flags[flags["anomalous"]]
+    print(f"Flagged {len(anomalous)} of {len(flags)} station-days as anomalous")
+    for reason, group in anomalous.groupby("reason"):
+        print(f"  {reason}: {len(group)}")
+    export_tables({"anomalous_station_days": flags}, args.export)
+
+
+if __name__ == "__main__":
+    main()
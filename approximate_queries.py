@@ -0,0 +1,173 @@
+# Approximate (stratified-sample) mode for the probability and time-of-day analyses.
+#
+# Snapshots are stratified by station x day type x 30-minute slot of the day. Each stratum gets a
+# random ordering once (fixed by --seed), and a sample at fraction f takes the first
+# ceil(f * N_h) rows of every stratum (at least MIN_PER_STRATUM), so growing the sample only adds
+# rows. Group estimates (a probability or a mean per hour bin, station, slot, ...) are the usual
+# stratified estimator over the strata the group is made of:
+#
+#     estimate = sum_h N_h * mean_h / N
+#     variance = sum_h N_h^2 * (1 - n_h / N_h) * s_h^2 / n_h / N^2
+#
+# reported with a 95% normal interval. Every group used by the analyses (hour_bin, day_category,
+# peak_status, STATION ID, time_of_day) is a union of whole strata, so the estimator applies as is.
+#
+# The sample grows until the widest 95% half-width is within --target-error, or until the next
+# round would overrun --time-budget seconds; with neither, one pass is made at --sample-fraction.
+#
+#     python availability_probability_analysis.py --approximate --target-error 0.01
+#     python all_station_time_of_day_analysis.py --approximate --time-budget 5
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from time_features import label_day_category
+
+SAMPLE_FRACTION = 0.05   # first-round sampling fraction
+MIN_PER_STRATUM = 2      # so every sampled stratum has a variance estimate
+MAX_GROWTH = 8.0         # largest factor the sample grows by between rounds
+Z_95 = 1.96
+
+STRATA_COLUMNS = ["STATION ID", "day_category", "slot"]
+
+
+def add_approximate_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument("--approximate", action="store_true", help="estimate from a stratified sample with error bounds")
+    parser.add_argument("--target-error", type=float, help="grow the sample until every 95%% half-width is within this")
+    parser.add_argument("--time-budget", type=float, help="stop growing the sample before this many seconds")
+    parser.add_argument("--sample-fraction", type=float, default=SAMPLE_FRACTION, help="first-round sampling fraction")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the sample")
+    return parser
+
+
+def add_strata_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Day type and 30-minute slot of the day (minutes since midnight), vectorized."""
+    df = df.copy()
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    df["slot"] = df["TIME"].dt.hour * 60 + df["TIME"].dt.minute // 30 * 30
+    df["day_category"] = label_day_category(df["TIME"])
+    return df
+
+
+def slot_label(slot: pd.Series) -> pd.Series:
+    """Slot minutes as the "%H:%M" time_of_day label used by the exact path."""
+    return slot.map(lambda minutes: f"{minutes // 60:02d}:{minutes % 60:02d}")
+
+
+class StratifiedSample:
+    """Nested stratified samples of a DataFrame; take(f) returns the rows of the f-sample."""
+
+    def __init__(self, df: pd.DataFrame, strata_cols=STRATA_COLUMNS, seed: int = 0):
+        self.df = df.reset_index(drop=True)
+        stratum = self.df.groupby(list(strata_cols), sort=False).ngroup().to_numpy()
+        self.sizes = np.bincount(stratum)
+
+        # Random rank of every row within its stratum
+        order = np.lexsort((np.random.default_rng(seed).random(len(stratum)), stratum))
+        starts = np.r_[0, np.cumsum(self.sizes)[:-1]]
+        rank = np.empty(len(stratum), dtype=np.int64)
+        rank[order] = np.arange(len(stratum)) - starts[stratum[order]]
+
+        self.stratum = stratum
+        self.rank = rank
+
+    def take(self, fraction: float) -> pd.DataFrame:
+        per_stratum = np.minimum(np.maximum(np.ceil(fraction * self.sizes), MIN_PER_STRATUM), self.sizes)
+        rows = self.rank < per_stratum[self.stratum]
+        sample = self.df[rows].copy()
+        sample["stratum"] = self.stratum[rows]
+        return sample
+
+
+def stratified_estimates(sample: pd.DataFrame, value_col: str, group_cols, sizes: np.ndarray, name: str = "estimate") -> pd.DataFrame:
+    """Per-group stratified estimate of the mean of value_col with its standard error and 95% CI."""
+    group_cols = list(group_cols)
+    cells = (
+        sample.groupby(["stratum"] + group_cols)[value_col]
+        .agg(["mean", "var", "count"])
+        .reset_index()
+    )
+    N_h = sizes[cells["stratum"].to_numpy()]
+    # A single draw only happens when the stratum has a single row, i.e. it is fully observed
+    var_h = cells["var"].fillna(0).to_numpy()
+    n_h = cells["count"].to_numpy()
+    cells["N"] = N_h
+    cells["weighted"] = N_h * cells["mean"]
+    cells["weighted_var"] = N_h ** 2 * (1 - n_h / N_h) * var_h / n_h
+
+    grouped = cells.groupby(group_cols)[["N", "count", "weighted", "weighted_var"]].sum().reset_index()
+    grouped[name] = grouped["weighted"] / grouped["N"]
+    grouped["se"] = np.sqrt(grouped["weighted_var"]) / grouped["N"]
+    grouped["half_width"] = Z_95 * grouped["se"]
+    grouped["ci_low"] = grouped[name] - grouped["half_width"]
+    grouped["ci_high"] = grouped[name] + grouped["half_width"]
+    grouped = grouped.rename(columns={"count": "n"}).drop(columns=["weighted", "weighted_var"])
+    return grouped[group_cols + [name, "ci_low", "ci_high", "half_width", "se", "n", "N"]]
+
+
+def approximate_probabilities(sample: pd.DataFrame, group_cols, event_col: str, sizes: np.ndarray) -> pd.DataFrame:
+    """Stratified counterpart of compute_probabilities (prob, ci_low, ci_high; n sampled of N)."""
+    sample = sample.assign(**{event_col: sample[event_col].astype(float)})
+    result = stratified_estimates(sample, event_col, group_cols, sizes, name="prob")
+    result["ci_low"] = result["ci_low"].clip(lower=0)
+    result["ci_high"] = result["ci_high"].clip(upper=1)
+    return result
+
+
+def run_approximate(sampler: StratifiedSample, estimate, target_error: float = None, time_budget: float = None,
+                    fraction: float = SAMPLE_FRACTION):
+    """
+    Call estimate(sample) -> {name: table with a half_width column} on growing samples until the
+    target error is met, the next round would overrun the time budget, or the sample is complete.
+    Returns the last tables and a summary of the sample used.
+    """
+    started = time.perf_counter()
+    fraction = min(max(fraction, 0.0), 1.0)
+    while True:
+        round_started = time.perf_counter()
+        sample = sampler.take(fraction)
+        tables = estimate(sample)
+        round_seconds = time.perf_counter() - round_started
+        widest = max((np.nanmax(t["half_width"]) if len(t) else 0.0) for t in tables.values())
+
+        if fraction >= 1 or (target_error is None and time_budget is None):
+            break
+        if target_error is not None and widest <= target_error:
+            break
+
+        if target_error is not None and widest > 0:
+            # Half-widths scale roughly with sqrt((1 - f) / f)
+            ratio = (target_error / widest) ** 2 * (1 - fraction) / fraction
+            needed = 1 / (1 + ratio)
+        else:
+            needed = fraction * 2
+        next_fraction = min(1.0, max(needed * 1.1, fraction * 1.25), fraction * MAX_GROWTH)
+
+        if time_budget is not None:
+            projected = round_seconds * next_fraction / fraction
+            if time.perf_counter() - started + projected > time_budget:
+                break
+        fraction = next_fraction
+
+    info = {
+        "fraction": fraction,
+        "sampled_rows": len(sample),
+        "total_rows": len(sampler.df),
+        "max_half_width": widest,
+        "seconds": time.perf_counter() - started,
+        "target_met": target_error is None or widest <= target_error,
+    }
+    return tables, info
+
+
+def describe_sample(info: dict, target_error: float = None) -> str:
+    text = (
+        f"Approximate: {info['sampled_rows']}/{info['total_rows']} snapshots ({info['fraction']:.1%}) "
+        f"in {info['seconds']:.2f}s, widest 95% half-width {info['max_half_width']:.4f}"
+    )
+    if target_error is not None and not info["target_met"]:
+        text += f" (target {target_error} not reached within the time budget)"
+    return text
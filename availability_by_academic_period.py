@@ -9,12 +9,15 @@
 # Plot bars for probability of near‑empty by hour (weekday vs weekend vs holiday) and by station for peak vs off‑peak; repeat for near‑full.
 
 import os
+import argparse
 import math
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import date
 
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
 # Event thresholds
 NEAR_EMPTY_THRESHOLD = 2      # bikes remaining
 NEAR_FULL_THRESHOLD = 2       # free stands remaining
@@ -110,6 +113,8 @@ def compute_probabilities(df: pd.DataFrame, group_col: str, event_col: str) -> p
 
 
 def plot_probabilities(df: pd.DataFrame, title: str, ylabel: str, filename: str):
+    import matplotlib.pyplot as plt
+
     ordered = [
         "teaching_weekday",
         "teaching_weekend",
@@ -137,7 +142,12 @@ def plot_probabilities(df: pd.DataFrame, title: str, ylabel: str, filename: str)
 
 
 def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Near-empty / near-full probabilities by academic period"))
+    args = parse_export_args(parser=parser)
+
     df = pd.read_csv("combined_cleaned_near_accommodation.csv")
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
     df["TIME"] = pd.to_datetime(df["TIME"])
     df["date"] = df["TIME"].dt.date
     df["weekday_num"] = df["TIME"].dt.weekday  # 0=Mon
@@ -149,6 +159,17 @@ def main():
     near_empty_prob = compute_probabilities(df, "period", "near_empty")
     near_full_prob = compute_probabilities(df, "period", "near_full")
 
+    if args.export:
+        export_tables(
+            {
+                "near_empty_by_academic_period": near_empty_prob,
+                "near_full_by_academic_period": near_full_prob,
+            },
+            args.export,
+        )
+    if args.headless:
+        return
+
     plot_probabilities(
         near_empty_prob,
         title="P(near-empty) by Academic Period near Accommodation",
@@ -0,0 +1,214 @@
+# Near-empty / near-full episodes and an interval index for querying them.
+#
+# The probability scripts count snapshots with AVAILABLE_BIKES <= 2, which says how often a
+# station is near empty but not for how long or how many separate times. Here the boolean
+# near_empty / near_full series of every station are turned into episodes
+# (STATION ID, kind, start, end, duration) with one vectorized run-length pass over the whole
+# dataset. An episode starts at the first snapshot in the run and ends at the first snapshot
+# after it (or at the last snapshot in the run when the station's data stops or has a gap).
+#
+# EpisodeIndex answers overlap queries such as "all near-empty episodes overlapping weekday
+# 08:00-09:00 during teaching_weekday" by binary search on the sorted episode starts, without
+# rescanning the snapshots:
+#
+#     index = EpisodeIndex(extract_episodes(df))
+#     hits = index.query("near_empty", "08:00", "09:00", period="teaching_weekday", weekdays=range(5))
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from time_features import NEAR_EMPTY_THRESHOLD, NEAR_FULL_THRESHOLD
+from availability_by_academic_period import assign_period
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+INPUT_CSV = "combined_cleaned_near_accommodation.csv"
+
+MAX_GAP = pd.Timedelta(hours=2)        # a longer gap between snapshots ends the episode
+LONG_EPISODE = pd.Timedelta(days=1)    # longer episodes are kept out of the binary-search index
+
+EPISODE_KINDS = ("near_empty", "near_full")
+
+
+def extract_episodes(df: pd.DataFrame, max_gap: pd.Timedelta = MAX_GAP) -> pd.DataFrame:
+    """Runs of consecutive near-empty / near-full snapshots for every station."""
+    df = df[["STATION ID", "TIME", "AVAILABLE_BIKES", "AVAILABLE_BIKE_STANDS"]].copy()
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    df = df.sort_values(["STATION ID", "TIME"], kind="mergesort").reset_index(drop=True)
+
+    station = df["STATION ID"].to_numpy()
+    time = df["TIME"].to_numpy()
+    # A break between row i-1 and row i: new station or a gap in the data
+    breaks = np.r_[True, (station[1:] != station[:-1]) | (np.diff(time) > max_gap.to_timedelta64())]
+    # Whether row i is followed by a contiguous snapshot of the same station
+    continues = np.r_[~breaks[1:], False]
+
+    flags = {
+        "near_empty": (df["AVAILABLE_BIKES"] <= NEAR_EMPTY_THRESHOLD).to_numpy(),
+        "near_full": (df["AVAILABLE_BIKE_STANDS"] <= NEAR_FULL_THRESHOLD).to_numpy(),
+    }
+
+    episodes = []
+    for kind, flag in flags.items():
+        prev = np.r_[False, flag[:-1]]
+        starts = np.flatnonzero(flag & (breaks | ~prev))
+        nxt = np.r_[flag[1:], False]
+        last_rows = np.flatnonzero(flag & (~continues | ~nxt))
+
+        # End at the next snapshot when there is one, otherwise at the run's last snapshot
+        end_rows = np.where(continues[last_rows], last_rows + 1, last_rows)
+        episodes.append(pd.DataFrame({
+            "STATION ID": station[starts],
+            "kind": kind,
+            "start": time[starts],
+            "end": time[end_rows],
+            "snapshots": last_rows - starts + 1,
+        }))
+
+    episodes = pd.concat(episodes, ignore_index=True)
+    episodes["duration_hours"] = (episodes["end"] - episodes["start"]) / pd.Timedelta(hours=1)
+    return episodes.sort_values(["kind", "start"], kind="mergesort").reset_index(drop=True)
+
+
+class EpisodeIndex:
+    """
+    Overlap index over episodes. Per kind, episodes are sorted by start; an episode overlaps
+    [a, b) when start < b and end > a, and since no indexed episode is longer than LONG_EPISODE,
+    every candidate has start in [a - LONG_EPISODE, b), which is a contiguous range found by
+    binary search. The few longer episodes are checked directly.
+    """
+
+    def __init__(self, episodes: pd.DataFrame, long_episode: pd.Timedelta = LONG_EPISODE):
+        self.episodes = episodes.reset_index(drop=True)
+        self.long_episode = long_episode.to_timedelta64()
+        self._by_kind = {}
+        for kind, group in self.episodes.groupby("kind"):
+            duration = (group["end"] - group["start"]).to_numpy()
+            short = group[duration <= self.long_episode].sort_values("start", kind="mergesort")
+            long_ = group[duration > self.long_episode]
+            self._by_kind[kind] = {
+                "rows": short.index.to_numpy(),
+                "start": short["start"].to_numpy(),
+                "end": short["end"].to_numpy(),
+                "long_rows": long_.index.to_numpy(),
+                "long_start": long_["start"].to_numpy(),
+                "long_end": long_["end"].to_numpy(),
+            }
+
+    def overlapping(self, kind: str, window_starts, window_ends) -> pd.DataFrame:
+        """Episodes of `kind` overlapping any of the [window_start, window_end) intervals."""
+        part = self._by_kind.get(kind)
+        if part is None:
+            return self.episodes.iloc[0:0]
+        a = np.asarray(window_starts, dtype="datetime64[ns]")
+        b = np.asarray(window_ends, dtype="datetime64[ns]")
+
+        lo = np.searchsorted(part["start"], a - self.long_episode, side="left")
+        hi = np.searchsorted(part["start"], b, side="left")
+        sizes = hi - lo
+        # Expand every [lo, hi) candidate range into positions, remembering its window
+        window = np.repeat(np.arange(len(a)), sizes)
+        pos = np.repeat(lo, sizes) + (np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes))
+        hit = part["end"][pos] > a[window]
+        rows = part["rows"][pos[hit]]
+
+        if len(part["long_rows"]):
+            long_hit = (part["long_start"][:, None] < b[None, :]) & (part["long_end"][:, None] > a[None, :])
+            rows = np.r_[rows, part["long_rows"][long_hit.any(axis=1)]]
+
+        return self.episodes.loc[np.unique(rows)]
+
+    def query(
+        self,
+        kind: str,
+        time_from: str,
+        time_to: str,
+        period: str = None,
+        weekdays=None,
+        station_id=None,
+        start_date=None,
+        end_date=None,
+    ) -> pd.DataFrame:
+        """
+        Episodes overlapping the daily window time_from-time_to (e.g. "08:00"-"09:00") on every
+        date matching the weekday / academic period filters.
+        """
+        first = pd.Timestamp(start_date) if start_date else self.episodes["start"].min().normalize()
+        last = pd.Timestamp(end_date) if end_date else self.episodes["end"].max().normalize()
+        dates = pd.date_range(first, last, freq="D")
+        if weekdays is not None:
+            dates = dates[dates.weekday.isin(list(weekdays))]
+        if period is not None:
+            dates = dates[[assign_period(d.date(), d.weekday()) == period for d in dates]]
+
+        hits = self.overlapping(
+            kind,
+            dates + pd.Timedelta(f"{time_from}:00"),
+            dates + pd.Timedelta(f"{time_to}:00"),
+        )
+        if station_id is not None:
+            hits = hits[hits["STATION ID"] == station_id]
+        return hits
+
+
+def summarise_episodes(episodes: pd.DataFrame) -> pd.DataFrame:
+    days_observed = (episodes["end"].max() - episodes["start"].min()) / pd.Timedelta(days=1)
+    summary = (
+        episodes.groupby(["STATION ID", "kind"])["duration_hours"]
+        .agg(episodes="count", mean_hours="mean", median_hours="median", max_hours="max", total_hours="sum")
+        .reset_index()
+    )
+    summary["episodes_per_day"] = summary["episodes"] / days_observed
+    return summary
+
+
+def plot_episode_summary(summary: pd.DataFrame, filename: str):
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    for ax, column, label in [
+        (axes[0], "episodes_per_day", "Episodes per day"),
+        (axes[1], "median_hours", "Median episode length (hours)"),
+    ]:
+        pivot = summary.pivot(index="STATION ID", columns="kind", values=column)
+        pivot.plot(kind="bar", ax=ax)
+        ax.set_ylabel(label)
+        ax.set_xlabel("Station ID")
+        ax.legend(title="")
+    fig.suptitle("Near-Empty / Near-Full Episodes by Station near Accommodation")
+    fig.tight_layout()
+    os.makedirs("graphs", exist_ok=True)
+    fig.savefig(os.path.join("graphs", filename))
+    plt.close(fig)
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Near-empty / near-full episodes"))
+    args = parse_export_args(parser=parser)
+
+    df = pd.read_csv(INPUT_CSV)
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+
+    episodes = extract_episodes(df)
+    summary = summarise_episodes(episodes)
+    print(summary.to_string(index=False))
+
+    index = EpisodeIndex(episodes)
+    morning = index.query("near_empty", "08:00", "09:00", period="teaching_weekday", weekdays=range(5))
+    print(f"Near-empty episodes overlapping weekday 08:00-09:00 in teaching weeks: {len(morning)}")
+
+    if args.export:
+        export_tables({"availability_episodes": episodes, "availability_episode_summary": summary}, args.export)
+    if args.headless:
+        return
+
+    plot_episode_summary(summary, "episodes_by_station_near_accommodation.png")
+    print("Graph saved to ./graphs/episodes_by_station_near_accommodation.png")
+
+
+if __name__ == "__main__":
+    main()
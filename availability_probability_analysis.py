@@ -7,74 +7,23 @@
 # Plot bars for probability of near‑empty by hour (weekday vs weekend vs holiday) and by station for peak vs off‑peak; repeat for near‑full.
 
 import os
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import math
-from datetime import datetime, date
-
-# Thresholds for events of interest
-NEAR_EMPTY_THRESHOLD = 2  # bikes remaining
-NEAR_FULL_THRESHOLD = 2   # free stands remaining
-
-# Hour bins for temporal analysis
-HOUR_BINS = [
-    ("morning_peak", 7, 10),
-    ("midday", 11, 15),
-    ("evening_peak", 16, 19),
-    ("night", 20, 23),
-    ("overnight", 0, 6),
-]
-
-# Irish bank holidays for 2022-2023 (inclusive)
-BANK_HOLIDAYS = {
-    # 2022
-    date(2022, 1, 3),  # New Year (observed)
-    date(2022, 3, 17), # St Patrick's Day
-    date(2022, 3, 18), # 2022 one-off bank holiday
-    date(2022, 4, 18), # Easter Monday
-    date(2022, 5, 2),  # May Day
-    date(2022, 6, 6),  # June bank holiday
-    date(2022, 8, 1),  # August bank holiday
-    date(2022, 10, 31),# October bank holiday
-    date(2022, 12, 26),# St Stephen's Day
-    date(2022, 12, 27),# Christmas (observed)
-    # 2023
-    date(2023, 1, 2),
-    date(2023, 3, 17),
-    date(2023, 4, 10),
-    date(2023, 5, 1),
-    date(2023, 6, 5),
-    date(2023, 8, 7),
-    date(2023, 10, 30),
-    date(2023, 12, 25),
-    date(2023, 12, 26),
-}
-
-
-def assign_hour_bin(ts: pd.Timestamp) -> str:
-    """Map an hour to a named bin."""
-    hour = ts.hour
-    for name, start, end in HOUR_BINS:
-        if start <= end and start <= hour <= end:
-            return name
-        if start > end and (hour >= start or hour <= end):
-            return name
-    return "other"
-
-
-def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["TIME"] = pd.to_datetime(df["TIME"])
-    df["date"] = df["TIME"].dt.date
-    df["hour_bin"] = df["TIME"].apply(assign_hour_bin)
-    df["day_category"] = np.where(df["TIME"].dt.weekday < 5, "weekday", "weekend")
-    df.loc[df["date"].isin(BANK_HOLIDAYS), "day_category"] = "bank_holiday"
-    df["peak_status"] = np.where(df["hour_bin"].isin(["morning_peak", "evening_peak"]), "peak", "off_peak")
-    df["near_empty"] = df["AVAILABLE_BIKES"] <= NEAR_EMPTY_THRESHOLD
-    df["near_full"] = df["AVAILABLE_BIKE_STANDS"] <= NEAR_FULL_THRESHOLD
-    return df
 
+from time_features import HOUR_BINS, add_time_features
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+from chunked_aggregates import add_chunked_arguments, chunked_event_counts
+from approximate_queries import (
+    add_approximate_arguments,
+    add_strata_columns,
+    StratifiedSample,
+    approximate_probabilities,
+    run_approximate,
+    describe_sample,
+)
 
 def proportion_ci(count: int, n: int, alpha: float = 0.05):
     if n == 0:
@@ -87,6 +36,12 @@ def proportion_ci(count: int, n: int, alpha: float = 0.05):
 
 def compute_probabilities(df: pd.DataFrame, group_cols, event_col: str) -> pd.DataFrame:
     grouped = df.groupby(group_cols)[event_col].agg(["sum", "count"]).reset_index()
+    return probabilities_from_counts(grouped)
+
+
+def probabilities_from_counts(grouped: pd.DataFrame) -> pd.DataFrame:
+    """Add probabilities and CIs to per-group event counts ("sum") and sample sizes ("count")."""
+    grouped = grouped.copy()
     grouped[["prob", "ci_low", "ci_high"]] = grouped.apply(
         lambda r: proportion_ci(r["sum"], r["count"]), axis=1, result_type="expand"
     )
@@ -109,6 +64,8 @@ def two_proportion_ztest(count1: int, n1: int, count2: int, n2: int):
 
 
 def plot_probability_bar(df: pd.DataFrame, x: str, hue: str, value: str, title: str, ylabel: str, filename: str):
+    import matplotlib.pyplot as plt
+
     pivot = df.pivot(index=x, columns=hue, values=value).fillna(0)
     pivot = pivot.reindex(index=[b[0] for b in HOUR_BINS if b[0] in pivot.index], columns=sorted(pivot.columns))
     ax = pivot.plot(kind="bar", figsize=(10, 6))
@@ -122,35 +79,126 @@ def plot_probability_bar(df: pd.DataFrame, x: str, hue: str, value: str, title:
     plt.close()
 
 
+def plot_station_peak_bar(df: pd.DataFrame, event_label: str, filename: str):
+    import matplotlib.pyplot as plt
+
+    pivot = df.pivot(index="STATION ID", columns="peak_status", values="prob").fillna(0)
+    pivot = pivot[sorted(pivot.columns)]
+    ax = pivot.plot(kind="bar", figsize=(10, 6))
+    ax.set_title(f"{event_label} by Station: Peak vs Off-Peak near Accommodation")
+    ax.set_ylabel(event_label)
+    ax.set_xlabel("Station ID")
+    ax.legend(title="peak_status")
+    plt.tight_layout()
+    os.makedirs("graphs", exist_ok=True)
+    plt.savefig(os.path.join("graphs", filename))
+    plt.close()
+
+
 def main():
-    df = pd.read_csv("combined_cleaned_near_accommodation.csv")
-    df = add_time_features(df)
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Near-empty / near-full probabilities by time of day and day type"))
+    add_chunked_arguments(parser)
+    add_approximate_arguments(parser)
+    args = parse_export_args(parser=parser)
+    if args.chunked and args.exclude_anomalies:
+        parser.error("--exclude-anomalies needs the whole dataset in memory; drop --chunked")
+    if args.chunked and args.approximate:
+        parser.error("--approximate samples the dataset in memory; drop --chunked")
+
+    input_csv = "combined_cleaned_near_accommodation.csv"
+    groupings = [["hour_bin", "day_category"], ["STATION ID", "peak_status"], ["peak_status"], ["day_category"]]
+
+    if args.chunked:
+        # Stream the CSV and reduce partial counts; identical counts to the in-memory path
+        counts = chunked_event_counts(input_csv, groupings, args.memory_limit_mb, args.workers)
+
+        def probabilities(group_cols, event_col):
+            grouped = counts[tuple(group_cols)][group_cols + [event_col, "count"]]
+            return probabilities_from_counts(grouped.rename(columns={event_col: "sum"}))
+    elif not args.approximate:
+        df = pd.read_csv(input_csv)
+        if args.exclude_anomalies:
+            df = drop_anomalous_days(df)
+        df = add_time_features(df)
+
+        def probabilities(group_cols, event_col):
+            return compute_probabilities(df, group_cols, event_col)
+    else:
+        df = pd.read_csv(input_csv)
+        if args.exclude_anomalies:
+            df = drop_anomalous_days(df)
+        # Stratify before labelling, so only the sampled rows go through add_time_features
+        sampler = StratifiedSample(add_strata_columns(df), seed=args.seed)
+
+        def estimate(sample):
+            sample = add_time_features(sample)
+            return {
+                (tuple(group_cols), event_col): approximate_probabilities(sample, group_cols, event_col, sampler.sizes)
+                for group_cols in groupings
+                for event_col in ["near_empty", "near_full"]
+            }
+
+        estimates, info = run_approximate(sampler, estimate, args.target_error, args.time_budget, args.sample_fraction)
+        print(describe_sample(info, args.target_error))
+
+        def probabilities(group_cols, event_col):
+            return estimates[(tuple(group_cols), event_col)]
 
     # Probabilities by hour bin and day type
-    near_empty_hour = compute_probabilities(df, ["hour_bin", "day_category"], "near_empty")
-    near_full_hour = compute_probabilities(df, ["hour_bin", "day_category"], "near_full")
+    near_empty_hour = probabilities(["hour_bin", "day_category"], "near_empty")
+    near_full_hour = probabilities(["hour_bin", "day_category"], "near_full")
 
     # Station-level peak vs off-peak probabilities
-    near_empty_station_peak = compute_probabilities(df, ["STATION ID", "peak_status"], "near_empty")
-    near_full_station_peak = compute_probabilities(df, ["STATION ID", "peak_status"], "near_full")
+    near_empty_station_peak = probabilities(["STATION ID", "peak_status"], "near_empty")
+    near_full_station_peak = probabilities(["STATION ID", "peak_status"], "near_full")
 
     # Aggregate peak vs off-peak (all stations combined)
-    peak_vs_off = compute_probabilities(df, ["peak_status"], "near_empty")
-    weekday_vs_holiday = compute_probabilities(df[df["day_category"].isin(["weekday", "bank_holiday"])], ["day_category"], "near_empty")
+    peak_vs_off = probabilities(["peak_status"], "near_empty")
+    by_day_category = probabilities(["day_category"], "near_empty")
+    weekday_vs_holiday = by_day_category[by_day_category["day_category"].isin(["weekday", "bank_holiday"])].reset_index(drop=True)
 
     # Hypothesis tests
-    if len(peak_vs_off) == 2:
+    if args.approximate:
+        # Estimates carry sampling error, so report their CIs rather than exact-looking tests
+        for table, col, a, b, label in [
+            (peak_vs_off, "peak_status", "peak", "off_peak", "peak vs off-peak"),
+            (weekday_vs_holiday, "day_category", "weekday", "bank_holiday", "weekday vs bank holiday"),
+        ]:
+            rows = table.set_index(col)
+            if {a, b} <= set(rows.index):
+                print(
+                    f"Near-empty: {label} (approximate, 95% CI): "
+                    f"{rows.at[a, 'prob']:.3f} [{rows.at[a, 'ci_low']:.3f}, {rows.at[a, 'ci_high']:.3f}] vs "
+                    f"{rows.at[b, 'prob']:.3f} [{rows.at[b, 'ci_low']:.3f}, {rows.at[b, 'ci_high']:.3f}]; "
+                    "z-tests need the exact path"
+                )
+    elif len(peak_vs_off) == 2:
         c1, n1 = peak_vs_off.loc[peak_vs_off["peak_status"] == "peak", ["event_count", "n"]].values[0]
         c2, n2 = peak_vs_off.loc[peak_vs_off["peak_status"] == "off_peak", ["event_count", "n"]].values[0]
         z, p = two_proportion_ztest(c1, n1, c2, n2)
         print(f"Near-empty: peak vs off-peak z={z:.3f}, p={p:.4f} (counts {c1}/{n1} vs {c2}/{n2})")
 
-    if len(weekday_vs_holiday) == 2:
+    if not args.approximate and len(weekday_vs_holiday) == 2:
         c1, n1 = weekday_vs_holiday.loc[weekday_vs_holiday["day_category"] == "weekday", ["event_count", "n"]].values[0]
         c2, n2 = weekday_vs_holiday.loc[weekday_vs_holiday["day_category"] == "bank_holiday", ["event_count", "n"]].values[0]
         z, p = two_proportion_ztest(c1, n1, c2, n2)
         print(f"Near-empty: weekday vs bank holiday z={z:.3f}, p={p:.4f} (counts {c1}/{n1} vs {c2}/{n2})")
 
+    if args.export:
+        export_tables(
+            {
+                "near_empty_by_hour_daytype": near_empty_hour,
+                "near_full_by_hour_daytype": near_full_hour,
+                "near_empty_peak_vs_off_by_station": near_empty_station_peak,
+                "near_full_peak_vs_off_by_station": near_full_station_peak,
+                "near_empty_peak_vs_off": peak_vs_off,
+                "near_empty_weekday_vs_holiday": weekday_vs_holiday,
+            },
+            args.export,
+        )
+    if args.headless:
+        return
+
     # Plots
     plot_probability_bar(
         near_empty_hour,
@@ -177,17 +225,7 @@ def main():
         (near_empty_station_peak, "P(near empty)", "near_empty_peak_vs_off_by_station_near_accommodation.png"),
         (near_full_station_peak, "P(near full)", "near_full_peak_vs_off_by_station_near_accommodation.png"),
     ]:
-        pivot = data.pivot(index="STATION ID", columns="peak_status", values="prob").fillna(0)
-        pivot = pivot[sorted(pivot.columns)]
-        ax = pivot.plot(kind="bar", figsize=(10, 6))
-        ax.set_title(f"{event_label} by Station: Peak vs Off-Peak near Accommodation")
-        ax.set_ylabel(event_label)
-        ax.set_xlabel("Station ID")
-        ax.legend(title="peak_status")
-        plt.tight_layout()
-        os.makedirs("graphs", exist_ok=True)
-        plt.savefig(os.path.join("graphs", fname))
-        plt.close()
+        plot_station_peak_bar(data, event_label, fname)
 
     print("Graphs saved to ./graphs. Run this script inside your virtual environment to refresh outputs.")
 
@@ -0,0 +1,280 @@
+# Local JSON query service over the precomputed availability aggregates.
+#
+# Build the aggregates first (python build_availability_aggregates.py), then run:
+#     python availability_query_service.py [port]
+#
+# Endpoints (all GET, all parameters optional unless stated):
+#   /probability?event=near_empty&station=7&hour_bin=morning_peak&day_category=weekday
+#   /probability?event=near_full&station=7&period=teaching_weekday
+#       event is required. Use either hour_bin/day_category or period. Any dimension left out is
+#       pooled across all its values, e.g. omit station for a fleet-wide probability.
+#   /time_of_day?station=7&slot=08:00
+#       mean fraction docked per 30-minute slot (mean of station means when pooling stations).
+#   /stations, /health
+#
+# The aggregates file is loaded once into in-memory indexes; pooled (composite) queries are
+# memoised in an LRU cache. The file is polled for changes and swapped in atomically when
+# build_availability_aggregates.py rewrites it. Only the standard library is used, so requests
+# never touch pandas.
+
+import os
+import sys
+import json
+import math
+import asyncio
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+AGGREGATES_PATH = os.path.join("aggregates", "availability_aggregates.json")
+HOST = "127.0.0.1"
+PORT = 8050
+RELOAD_INTERVAL = 2.0   # seconds between checks for a rebuilt aggregates file
+CACHE_SIZE = 1024       # composite query results kept in the LRU cache
+
+EVENTS = ("near_empty", "near_full")
+
+# Dimensions of each table, in key order
+TABLE_DIMS = {
+    "hour_bin": ("station", "hour_bin", "day_category"),
+    "period": ("station", "period"),
+    "time_of_day": ("station", "slot"),
+}
+
+# Source column for each dimension in the aggregates file
+DIM_COLUMNS = {
+    "station": "STATION ID",
+    "hour_bin": "hour_bin",
+    "day_category": "day_category",
+    "period": "period",
+    "slot": "time_of_day",
+}
+
+
+def proportion_ci(count: int, n: int):
+    if n == 0:
+        return (math.nan, math.nan, math.nan)
+    p = count / n
+    z = 1.96
+    se = math.sqrt(p * (1 - p) / n)
+    return p, max(0, p - z * se), min(1, p + z * se)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class AggregateStore:
+    """In-memory indexes over one version of the aggregates file."""
+
+    def __init__(self, payload: dict, mtime: float):
+        self.mtime = mtime
+        self.built_at = payload.get("built_at")
+        self.rows = {}       # table -> {key tuple: values}
+        self.postings = {}   # table -> {(dim position, value): [key tuple, ...]}
+        self.cache = LRUCache()
+
+        for table, dims in TABLE_DIMS.items():
+            rows = {}
+            postings = {}
+            for record in payload["tables"][table]:
+                key = tuple(str(record[DIM_COLUMNS[d]]) for d in dims)
+                rows[key] = record
+                for pos, value in enumerate(key):
+                    postings.setdefault((pos, value), []).append(key)
+            self.rows[table] = rows
+            self.postings[table] = postings
+
+        self.stations = sorted({k[0] for k in self.rows["hour_bin"]}, key=int)
+
+    @classmethod
+    def load(cls, path: str = AGGREGATES_PATH):
+        mtime = os.stat(path).st_mtime
+        with open(path) as f:
+            payload = json.load(f)
+        return cls(payload, mtime)
+
+    def match(self, table: str, filters: dict):
+        """All keys of `table` whose dimensions equal the given filters."""
+        dims = TABLE_DIMS[table]
+        wanted = [(dims.index(d), v) for d, v in filters.items()]
+        if not wanted:
+            return list(self.rows[table])
+        # Start from the smallest posting list and check the remaining dimensions
+        wanted.sort(key=lambda pv: len(self.postings[table].get(pv, ())))
+        candidates = self.postings[table].get(wanted[0], [])
+        return [k for k in candidates if all(k[pos] == v for pos, v in wanted[1:])]
+
+    def probability(self, event: str, table: str, filters: dict) -> dict:
+        key = tuple(filters.get(d) for d in TABLE_DIMS[table])
+        if None not in key:
+            record = self.rows[table].get(key)
+            keys = [key] if record is not None else []
+        else:
+            cache_key = ("probability", event, table, key)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            keys = self.match(table, filters)
+
+        count = sum(self.rows[table][k][f"{event}_count"] for k in keys)
+        n = sum(self.rows[table][k]["n"] for k in keys)
+        prob, ci_low, ci_high = proportion_ci(count, n)
+        result = {
+            "event": event,
+            "filters": filters,
+            "event_count": count,
+            "n": n,
+            "prob": None if n == 0 else prob,
+            "ci_low": None if n == 0 else ci_low,
+            "ci_high": None if n == 0 else ci_high,
+            "groups_pooled": len(keys),
+        }
+        if None in key:
+            self.cache.put(cache_key, result)
+        return result
+
+    def time_of_day(self, filters: dict) -> dict:
+        cache_key = ("time_of_day", tuple(sorted(filters.items())))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Mean of the per-station means, as in all_station_time_of_day_analysis.py
+        by_slot = {}
+        for station, slot in self.match("time_of_day", filters):
+            by_slot.setdefault(slot, []).append(self.rows["time_of_day"][(station, slot)])
+        profile = {
+            slot: {
+                "frac_docked": sum(r["frac_docked"] for r in records) / len(records),
+                "n": sum(r["n"] for r in records),
+                "stations": len(records),
+            }
+            for slot, records in sorted(by_slot.items())
+        }
+        result = {"filters": filters, "profile": profile}
+        self.cache.put(cache_key, result)
+        return result
+
+
+class QueryError(Exception):
+    pass
+
+
+class UnknownEndpoint(Exception):
+    pass
+
+
+def parse_filters(params: dict, allowed) -> dict:
+    filters = {}
+    for name, values in params.items():
+        if name == "event":
+            continue
+        if name not in allowed:
+            raise QueryError(f"unknown parameter '{name}'")
+        if values[0] not in ("", "all"):
+            filters[name] = values[0]
+    return filters
+
+
+def handle_query(store: AggregateStore, path: str, params: dict) -> dict:
+    if path == "/health":
+        return {"status": "ok", "built_at": store.built_at}
+    if path == "/stations":
+        return {"stations": [int(s) for s in store.stations]}
+    if path == "/probability":
+        event = params.get("event", [None])[0]
+        if event not in EVENTS:
+            raise QueryError(f"event must be one of {', '.join(EVENTS)}")
+        table = "period" if "period" in params else "hour_bin"
+        return store.probability(event, table, parse_filters(params, TABLE_DIMS[table]))
+    if path == "/time_of_day":
+        return store.time_of_day(parse_filters(params, TABLE_DIMS["time_of_day"]))
+    raise UnknownEndpoint(path)
+
+
+class QueryService:
+    def __init__(self, path: str = AGGREGATES_PATH):
+        self.path = path
+        self.store = AggregateStore.load(path)
+        self.watcher = None
+
+    async def watch(self):
+        """Swap in a fresh store whenever the aggregates file is rebuilt."""
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                if os.stat(self.path).st_mtime != self.store.mtime:
+                    self.store = await asyncio.to_thread(AggregateStore.load, self.path)
+                    print(f"Reloaded aggregates built at {self.store.built_at}")
+            except (OSError, ValueError, KeyError) as exc:
+                # Keep serving the previous version if the new file is missing or malformed
+                print(f"⚠️  Could not reload {self.path}: {exc}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            # Drain headers; the service only needs the request line
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+
+            if len(request_line) < 2:
+                status, body = 400, {"error": "malformed request"}
+            elif request_line[0] != "GET":
+                status, body = 405, {"error": "only GET is supported"}
+            else:
+                url = urlsplit(request_line[1])
+                try:
+                    status, body = 200, handle_query(self.store, url.path, parse_qs(url.query, keep_blank_values=True))
+                except QueryError as exc:
+                    status, body = 400, {"error": str(exc)}
+                except UnknownEndpoint:
+                    status, body = 404, {"error": f"no endpoint {url.path}"}
+                except Exception as exc:
+                    print(f"⚠️  Error handling {request_line[1]}: {exc!r}")
+                    status, body = 500, {"error": "internal error"}
+
+            data = json.dumps(body).encode()
+            reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}[status]
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        # Keep a reference: the event loop only holds tasks weakly
+        self.watcher = asyncio.create_task(self.watch())
+        print(f"Serving aggregates built at {self.store.built_at} on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    if not os.path.exists(AGGREGATES_PATH):
+        print(f"⚠️  {AGGREGATES_PATH} not found. Run build_availability_aggregates.py first.")
+        return
+    asyncio.run(QueryService().serve(port=port))
+
+
+if __name__ == "__main__":
+    main()
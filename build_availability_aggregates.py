@@ -0,0 +1,99 @@
+# Precompute the per-station availability aggregates served by availability_query_service.py.
+# Re-run this after clean_data.py whenever the combined CSV is rebuilt; the service picks up the
+# new file automatically.
+#
+# Aggregates written:
+#   - near-empty / near-full event counts by station x hour_bin x day_category
+#   - near-empty / near-full event counts by station x academic period
+#   - mean fraction docked by station x 30-minute time-of-day slot
+#
+# Counts (rather than probabilities) are stored so that queries spanning several stations or
+# categories can be pooled exactly.
+#
+#     python build_availability_aggregates.py [input_csv] [--exclude-anomalies]
+
+import os
+import json
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+from time_features import add_time_features
+from availability_by_academic_period import assign_period
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+INPUT_CSV = "combined_cleaned_near_accommodation.csv"
+AGGREGATES_DIR = "aggregates"
+AGGREGATES_PATH = os.path.join(AGGREGATES_DIR, "availability_aggregates.json")
+
+
+def count_events(df: pd.DataFrame, group_cols) -> pd.DataFrame:
+    """Near-empty / near-full event counts and sample size per group."""
+    return (
+        df.groupby(group_cols)
+        .agg(
+            near_empty_count=("near_empty", "sum"),
+            near_full_count=("near_full", "sum"),
+            n=("near_empty", "count"),
+        )
+        .reset_index()
+    )
+
+
+def time_of_day_profile(df: pd.DataFrame) -> pd.DataFrame:
+    """Mean fraction docked per station and 30-minute slot."""
+    df = df.copy()
+    df["frac_docked"] = df["AVAILABLE_BIKES"] / df["BIKE_STANDS"]
+    # Snapshots drift a few seconds either side of the half hour, so round rather than truncate
+    df["time_of_day"] = df["TIME"].dt.round("30min").dt.strftime("%H:%M")
+    return (
+        df.groupby(["STATION ID", "time_of_day"])["frac_docked"]
+        .agg(frac_docked="mean", n="count")
+        .reset_index()
+    )
+
+
+def build_aggregates(df: pd.DataFrame) -> dict:
+    df = add_time_features(df)
+    df["period"] = [assign_period(d, wd) for d, wd in zip(df["date"], df["TIME"].dt.weekday)]
+
+    tables = {
+        "hour_bin": count_events(df, ["STATION ID", "hour_bin", "day_category"]),
+        "period": count_events(df, ["STATION ID", "period"]),
+        "time_of_day": time_of_day_profile(df),
+    }
+    return {name: table.to_dict(orient="records") for name, table in tables.items()}
+
+
+def write_aggregates(aggregates: dict, source: str, exclude_anomalies: bool = False, path: str = AGGREGATES_PATH):
+    payload = {
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "exclude_anomalies": exclude_anomalies,
+        "tables": aggregates,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and swap it in so a running service never reads a half-written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, default=int)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Precompute the availability aggregates"))
+    parser.add_argument("input_csv", nargs="?", default=INPUT_CSV)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input_csv)
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+    aggregates = build_aggregates(df)
+    write_aggregates(aggregates, source=args.input_csv, exclude_anomalies=args.exclude_anomalies)
+    sizes = ", ".join(f"{name}={len(rows)}" for name, rows in aggregates.items())
+    print(f"Saved aggregates ({sizes}) to {AGGREGATES_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Out-of-core (chunked map-reduce) execution of the main aggregations.
+#
+# The analysis scripts load the whole combined CSV into one DataFrame. For data larger than RAM,
+# this module streams the CSV in fixed-size chunks, maps every chunk to partial aggregates (sums
+# and counts per group), optionally in parallel worker processes, and reduces the partials by
+# summing them. Counts come out exactly as in the in-memory path; means are sum / count and match
+# the in-memory groupby means up to floating-point summation order.
+#
+# Chunk size is derived from a memory ceiling: a sample of rows gives the in-memory size per row,
+# and the chunk is sized so that every chunk in flight (one per worker, plus the one being read)
+# fits within the ceiling together with the columns the map step derives.
+#
+# Used by year_comparison.py, time_of_day_analysis.py and availability_probability_analysis.py
+# through their --chunked flag, e.g.
+#     python year_comparison.py --chunked --memory-limit-mb 256 --workers 4
+
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from time_features import add_time_features
+
+MEMORY_LIMIT_MB = 512
+SAMPLE_ROWS = 5_000
+MIN_CHUNK_ROWS = 1_000
+# Map steps add derived columns (datetimes, labels, flags); allow for that on top of the raw chunk
+WORKING_SET_FACTOR = 4.0
+
+
+def add_chunked_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument("--chunked", action="store_true", help="stream the CSV in chunks instead of loading it whole")
+    parser.add_argument("--memory-limit-mb", type=float, default=MEMORY_LIMIT_MB, help="memory ceiling for chunked mode")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes for chunked mode (0 = run in-process)")
+    return parser
+
+
+def chunk_rows_for_memory(path: str, memory_limit_mb: float = MEMORY_LIMIT_MB, workers: int = 0) -> int:
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS)
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    in_flight = workers + 1
+    rows = int(memory_limit_mb * 1024 ** 2 / (bytes_per_row * WORKING_SET_FACTOR * in_flight))
+    return max(rows, MIN_CHUNK_ROWS)
+
+
+def run_chunked(path: str, map_func, memory_limit_mb: float = MEMORY_LIMIT_MB, workers: int = 0) -> dict:
+    """
+    Apply map_func to every chunk of the CSV and sum its partial aggregates.
+    map_func returns {name: DataFrame indexed by group keys}; the result has the same shape.
+    """
+    chunk_rows = chunk_rows_for_memory(path, memory_limit_mb, workers)
+    reader = pd.read_csv(path, chunksize=chunk_rows)
+    partials = {}
+
+    def collect(result: dict):
+        for name, frame in result.items():
+            partials.setdefault(name, []).append(frame)
+        # Fold partials as we go so their number stays bounded
+        for name, frames in partials.items():
+            if len(frames) > 1:
+                partials[name] = [_sum_partials(frames)]
+
+    if workers <= 0:
+        for chunk in reader:
+            collect(map_func(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for chunk in reader:
+                pending.append(pool.submit(map_func, chunk))
+                # Bound the chunks in flight so memory stays under the ceiling
+                if len(pending) >= workers:
+                    collect(pending.pop(0).result())
+            for future in pending:
+                collect(future.result())
+
+    return {name: _sum_partials(frames) for name, frames in partials.items()}
+
+
+def _sum_partials(frames) -> pd.DataFrame:
+    combined = pd.concat(frames)
+    return combined.groupby(level=list(range(combined.index.nlevels))).sum()
+
+
+# -----------------------------
+# Map steps (top-level so worker processes can unpickle them)
+# -----------------------------
+def map_station_year_usage(chunk: pd.DataFrame) -> dict:
+    frac = (chunk["BIKE_STANDS"] - chunk["AVAILABLE_BIKES"]) / chunk["BIKE_STANDS"]
+    grouped = frac.groupby([chunk["YEAR"], chunk["STATION ID"]])
+    return {"usage": pd.DataFrame({"sum": grouped.sum(), "count": grouped.count()})}
+
+
+def map_time_of_day(chunk: pd.DataFrame, station_id: int, year: int) -> dict:
+    chunk = chunk[(chunk["STATION ID"] == station_id) & (chunk["YEAR"] == year)]
+    frac = chunk["AVAILABLE_BIKES"] / chunk["BIKE_STANDS"]
+    time_of_day = pd.to_datetime(chunk["TIME"]).dt.strftime("%H:%M").rename("time_of_day")
+    grouped = frac.groupby(time_of_day)
+    return {"time_of_day": pd.DataFrame({"sum": grouped.sum(), "count": grouped.count()})}
+
+
+def map_event_counts(chunk: pd.DataFrame, groupings) -> dict:
+    chunk = add_time_features(chunk)
+    result = {}
+    for group_cols in groupings:
+        grouped = chunk.groupby(list(group_cols))
+        counts = grouped[["near_empty", "near_full"]].sum()
+        counts["count"] = grouped.size()
+        result[tuple(group_cols)] = counts
+    return result
+
+
+# -----------------------------
+# Chunked equivalents of the in-memory aggregations
+# -----------------------------
+def chunked_station_means(path: str, memory_limit_mb: float = MEMORY_LIMIT_MB, workers: int = 0) -> pd.DataFrame:
+    """Long (YEAR, STATION ID, frac_not_docked) means, as grouped in year_comparison.py."""
+    usage = run_chunked(path, map_station_year_usage, memory_limit_mb, workers)["usage"]
+    return (usage["sum"] / usage["count"]).rename("frac_not_docked").reset_index()
+
+
+def chunked_mean_fraction_by_slot(
+    path: str, station_id: int, year: int, memory_limit_mb: float = MEMORY_LIMIT_MB, workers: int = 0
+) -> pd.Series:
+    """Mean fraction docked per time_of_day slot, as in time_of_day_analysis.py."""
+    result = run_chunked(path, partial(map_time_of_day, station_id=station_id, year=year), memory_limit_mb, workers)
+    if "time_of_day" not in result:
+        return pd.Series(dtype=float, name="frac_docked").rename_axis("time_of_day")
+    totals = result["time_of_day"]
+    return (totals["sum"] / totals["count"]).rename("frac_docked").sort_index()
+
+
+def chunked_event_counts(path: str, groupings, memory_limit_mb: float = MEMORY_LIMIT_MB, workers: int = 0) -> dict:
+    """
+    Near-empty / near-full counts and sample sizes for each grouping in one pass over the CSV.
+    Returns {tuple(group_cols): DataFrame with group columns, near_empty, near_full, count}.
+    """
+    groupings = [tuple(g) for g in groupings]
+    result = run_chunked(path, partial(map_event_counts, groupings=groupings), memory_limit_mb, workers)
+    return {g: result[g].reset_index() for g in groupings}
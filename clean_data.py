@@ -3,6 +3,8 @@ import os
 from pathlib import Path
 import re
 
+from raw_archive_reader import COLUMN_ALIASES, iter_raw_sources, sniff_header, canonical_columns, read_raw_chunks
+
 # Directories
 INPUT_DIR = Path("uncleaned_csv")
 OUTPUT_DIR = Path("cleaned_csv")
@@ -14,42 +16,56 @@ combined_df = []
 # Station IDs to keep
 KEEP_STATIONS = {7, 45, 72, 73}
 
+# Columns every raw file must provide (after renaming) for the downstream analyses
+REQUIRED_COLUMNS = ["STATION ID", "TIME", "BIKE_STANDS", "AVAILABLE_BIKES", "AVAILABLE_BIKE_STANDS"]
+
 # Regex to detect year and month in filenames (e.g. "dublinbike-historical-data-2022-07.csv")
 YEAR_MONTH_PATTERN = re.compile(r"(\d{4})[-_](\d{2})")
 
-csv_files = list(INPUT_DIR.glob("*.csv"))
+# Raw CSVs, plain or inside .gz/.xz/.bz2/.zip archives (read without extracting)
+raw_sources = list(iter_raw_sources(INPUT_DIR))
 
-if not csv_files:
-    print("No CSV files found in 'uncleaned_csv'.")
+if not raw_sources:
+    print("No CSV files or archives found in 'uncleaned_csv'.")
 else:
-    for file_path in csv_files:
-        print(f"Processing: {file_path.name}")
+    for file_name, opener in raw_sources:
+        print(f"Processing: {file_name}")
 
         # Extract year and month from filename
-        match = YEAR_MONTH_PATTERN.search(file_path.name)
+        match = YEAR_MONTH_PATTERN.search(file_name)
         if match:
             year, month = match.groups()
         else:
-            print(f"⚠️  Could not detect year/month in filename '{file_path.name}', skipping.")
+            print(f"⚠️  Could not detect year/month in filename '{file_name}', skipping.")
             continue
 
-        # Load CSV
-        df = pd.read_csv(file_path)
+        # Map the file's header onto the canonical column names
+        header = sniff_header(opener)
+        rename = canonical_columns(header)
 
-        # Ensure required column exists
-        if "STATION ID" not in df.columns:
-            print(f"⚠️  Skipping {file_path.name}: missing STATION ID column")
+        # Ensure required columns exist
+        missing = [c for c in REQUIRED_COLUMNS if c not in rename.values()]
+        if missing:
+            print(f"⚠️  Skipping {file_name}: no recognised {', '.join(missing)} column(s) in header {header}")
             continue
+        drifted = {raw: canonical for raw, canonical in rename.items() if raw != canonical}
+        if drifted:
+            print(f"   Renamed columns: {drifted}")
 
-        # Filter by station IDs
-        df_filtered = df[df["STATION ID"].isin(KEEP_STATIONS)]
+        # Stream the file in chunks, keeping only the stations of interest
+        chunks = [chunk[chunk["STATION ID"].isin(KEEP_STATIONS)] for chunk in read_raw_chunks(opener, rename)]
+        df_filtered = pd.concat(chunks, ignore_index=True)
+        df_filtered = df_filtered.reindex(columns=[c for c in COLUMN_ALIASES if c in df_filtered.columns])
 
         # Add year and month columns
         df_filtered["YEAR"] = int(year)
         df_filtered["MONTH"] = int(month)
 
+        # Store sorted by (station, time) so StationTimeIndex can slice instead of scan
+        df_filtered = df_filtered.sort_values(["STATION ID", "TIME"], kind="mergesort")
+
         # Save individual cleaned CSV
-        output_path = OUTPUT_DIR / file_path.name
+        output_path = OUTPUT_DIR / file_name
         df_filtered.to_csv(output_path, index=False)
         print(f"✔️ Saved cleaned file to: {output_path}")
 
@@ -59,8 +75,9 @@ else:
     # Create and save combined dataset if anything was processed
     if combined_df:
         merged = pd.concat(combined_df, ignore_index=True)
+        merged = merged.sort_values(["STATION ID", "TIME"], kind="mergesort")
         merged.to_csv("combined_cleaned_near_accommodation.csv", index=False)
-        print("📌 Combined dataset saved as 'combined_cleaned.csv'")
+        print("📌 Combined dataset saved as 'combined_cleaned_near_accommodation.csv'")
     else:
         print("⚠️ No cleaned data to combine.")
 
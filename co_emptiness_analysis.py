@@ -0,0 +1,189 @@
+# Pairwise co-emptiness: how often two stations are near empty at the same time.
+#
+# When a station is empty users walk to a neighbour, so for every pair of stations (A, B) we want
+# P(both near empty) and P(B near empty | A near empty), per hour_bin x day_category and overall.
+#
+# All stations are put on a shared 30-minute grid. For each stratum the near-empty and observed
+# masks (station x slot) are bit-packed along time into uint64 words, and the pairwise counts are
+# popcounts of ANDed words, computed a block of stations at a time against all others:
+#
+#   both_observed[a, b] = popcount(observed_a & observed_b)
+#   both_empty[a, b]    = popcount(empty_a & empty_b)
+#   a_empty[a, b]       = popcount(empty_a & observed_b)     (A empty while B was observed)
+#
+# so P(both empty) = both_empty / both_observed and P(B | A) = both_empty / a_empty, both over the
+# slots in which the two stations were observed together.
+#
+# The heatmap orders stations by average-linkage clustering on the Jaccard distance of their
+# near-empty slots (numpy only, to avoid adding scipy as a dependency).
+#
+#     python co_emptiness_analysis.py [input_csv] [--headless] [--export csv]
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from time_features import NEAR_EMPTY_THRESHOLD, label_hour_bins, label_day_category, station_slot_grid
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+INPUT_CSV = "combined_cleaned.csv"
+BLOCK_STATIONS = 16   # stations compared against all others per vectorized step
+
+
+def build_masks(df: pd.DataFrame):
+    """Near-empty and observed masks (station x slot) on a shared grid, plus per-slot labels."""
+    slots, frames = station_slot_grid(df, ["AVAILABLE_BIKES"])
+    bikes = frames["AVAILABLE_BIKES"]
+    observed = bikes.notna().to_numpy()
+    empty = observed & (bikes.to_numpy() <= NEAR_EMPTY_THRESHOLD)
+    labels = pd.DataFrame({"hour_bin": label_hour_bins(slots), "day_category": label_day_category(slots)})
+    return bikes.index.to_numpy(), empty, observed, labels
+
+
+def pack_bits(mask: np.ndarray) -> np.ndarray:
+    """Pack a boolean (station x slot) mask along time into uint64 words."""
+    packed = np.packbits(mask, axis=1)
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def pairwise_popcount(x: np.ndarray, y: np.ndarray, block: int = BLOCK_STATIONS) -> np.ndarray:
+    """counts[a, b] = number of bits set in both x[a] and y[b] (packed uint64 rows)."""
+    counts = np.empty((len(x), len(y)), dtype=np.int64)
+    for i in range(0, len(x), block):
+        both = x[i:i + block, None, :] & y[None, :, :]
+        counts[i:i + block] = np.bitwise_count(both).sum(axis=2, dtype=np.int64)
+    return counts
+
+
+def co_emptiness_counts(empty: np.ndarray, observed: np.ndarray) -> dict:
+    """Pairwise counts for one set of slots (columns of the masks)."""
+    empty_bits = pack_bits(empty)
+    observed_bits = pack_bits(observed)
+    return {
+        "both_observed": pairwise_popcount(observed_bits, observed_bits),
+        "both_empty": pairwise_popcount(empty_bits, empty_bits),
+        "a_empty": pairwise_popcount(empty_bits, observed_bits),
+    }
+
+
+def counts_to_table(stations: np.ndarray, counts: dict) -> pd.DataFrame:
+    n = len(stations)
+    table = pd.DataFrame({
+        "station_a": np.repeat(stations, n),
+        "station_b": np.tile(stations, n),
+        **{name: matrix.ravel() for name, matrix in counts.items()},
+    })
+    table = table[table["station_a"] != table["station_b"]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["p_both_empty"] = table["both_empty"] / table["both_observed"].where(table["both_observed"] > 0)
+        table["p_b_given_a"] = table["both_empty"] / table["a_empty"].where(table["a_empty"] > 0)
+    return table.reset_index(drop=True)
+
+
+def co_emptiness(stations, empty, observed, labels) -> pd.DataFrame:
+    """Pairwise table per hour_bin x day_category, plus an "all" x "all" stratum over every slot."""
+    tables = [counts_to_table(stations, co_emptiness_counts(empty, observed)).assign(hour_bin="all", day_category="all")]
+    for (hour_bin, day_category), cols in labels.groupby(["hour_bin", "day_category"]).indices.items():
+        counts = co_emptiness_counts(empty[:, cols], observed[:, cols])
+        tables.append(counts_to_table(stations, counts).assign(hour_bin=hour_bin, day_category=day_category))
+    table = pd.concat(tables, ignore_index=True)
+    front = ["hour_bin", "day_category", "station_a", "station_b"]
+    return table[front + [c for c in table.columns if c not in front]]
+
+
+def average_linkage_order(distance: np.ndarray) -> np.ndarray:
+    """Leaf order of average-linkage agglomerative clustering on a square distance matrix."""
+    dist = distance.astype(float).copy()
+    np.fill_diagonal(dist, np.inf)
+    clusters = [[i] for i in range(len(dist))]
+    sizes = np.ones(len(dist))
+    active = np.ones(len(dist), dtype=bool)
+
+    for _ in range(len(dist) - 1):
+        masked = np.where(active[:, None] & active[None, :], dist, np.inf)
+        a, b = np.unravel_index(np.argmin(masked), masked.shape)
+        # Merge b into a; the average distance to every other cluster is size-weighted
+        merged = (dist[a] * sizes[a] + dist[b] * sizes[b]) / (sizes[a] + sizes[b])
+        dist[a, :] = merged
+        dist[:, a] = merged
+        dist[a, a] = np.inf
+        sizes[a] += sizes[b]
+        active[b] = False
+        clusters[a] = clusters[a] + clusters[b]
+
+    return np.array(clusters[int(np.flatnonzero(active)[0])])
+
+
+def cluster_order(pairs: pd.DataFrame) -> np.ndarray:
+    """Stations ordered so that those that empty together sit next to each other."""
+    both = pairs.pivot(index="station_a", columns="station_b", values="both_empty").fillna(0)
+    stations = both.index.to_numpy()
+    both = both.reindex(columns=stations).to_numpy()
+    a_empty = pairs.pivot(index="station_a", columns="station_b", values="a_empty").reindex(index=stations, columns=stations).fillna(0).to_numpy()
+    union = a_empty + a_empty.T - both
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaccard = np.where(union > 0, both / union, 0.0)
+    return stations[average_linkage_order(1 - jaccard)]
+
+
+def plot_conditional_heatmap(table: pd.DataFrame, order: np.ndarray, title: str, filename: str):
+    import matplotlib.pyplot as plt
+
+    matrix = table.pivot(index="station_a", columns="station_b", values="p_b_given_a").reindex(index=order, columns=order)
+    size = max(6, len(order) * 0.12)
+    fig, ax = plt.subplots(figsize=(size + 2, size))
+    image = ax.imshow(matrix.to_numpy(), cmap="viridis", vmin=0, vmax=1)
+    ax.set_xticks(range(len(order)))
+    ax.set_yticks(range(len(order)))
+    fontsize = 8 if len(order) <= 40 else 4
+    ax.set_xticklabels(order, rotation=90, fontsize=fontsize)
+    ax.set_yticklabels(order, fontsize=fontsize)
+    ax.set_xlabel("Station B")
+    ax.set_ylabel("Station A")
+    ax.set_title(title)
+    fig.colorbar(image, ax=ax, label="P(B near empty | A near empty)")
+    fig.tight_layout()
+    os.makedirs("graphs", exist_ok=True)
+    fig.savefig(os.path.join("graphs", filename))
+    plt.close(fig)
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Pairwise co-emptiness across stations"))
+    parser.add_argument("input_csv", nargs="?", default=INPUT_CSV)
+    args = parse_export_args(parser=parser)
+
+    df = pd.read_csv(args.input_csv)
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+
+    stations, empty, observed, labels = build_masks(df)
+    print(f"{len(stations)} stations x {empty.shape[1]} slots, {len(stations) * (len(stations) - 1) // 2} pairs")
+    table = co_emptiness(stations, empty, observed, labels)
+
+    overall = table[(table["hour_bin"] == "all") & (table["day_category"] == "all")]
+    order = cluster_order(overall)
+    print(overall.sort_values("p_b_given_a", ascending=False).head(10).to_string(index=False))
+
+    if args.export:
+        export_tables({"co_emptiness_by_hour_daytype": table}, args.export)
+    if args.headless:
+        return
+
+    plot_conditional_heatmap(overall, order, "P(B Near-Empty | A Near-Empty), Clustered", "co_emptiness_heatmap.png")
+    morning = table[(table["hour_bin"] == "morning_peak") & (table["day_category"] == "weekday")]
+    if len(morning):
+        plot_conditional_heatmap(
+            morning, order, "P(B Near-Empty | A Near-Empty), Weekday Morning Peak", "co_emptiness_heatmap_weekday_morning_peak.png"
+        )
+    print("Graphs saved to ./graphs.")
+
+
+if __name__ == "__main__":
+    main()
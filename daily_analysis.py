@@ -1,40 +1,66 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 
-df = pd.read_csv('combined_cleaned.csv')
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments
+from station_time_index import load_station_index, StationTimeIndex
 
-station_id = 21   # replace with actual station ID
-year = 2023
-station_data = df[(df['STATION ID'] == station_id) & (df['YEAR'] == year)]
-station_data['TIME'] = pd.to_datetime(station_data['TIME'])
 
-# Filter only January
-station_data = station_data[station_data['TIME'].dt.month == 1]
+def january_daily_summary(index: StationTimeIndex, station_id: int, year: int) -> pd.Series:
+    # January for this station, as a contiguous slice of the sorted index
+    station_data = index.month(station_id, year, 1).copy()
 
-# Create a daily column
-station_data['day'] = station_data['TIME'].dt.date
+    # Create a daily column
+    station_data['day'] = station_data['TIME'].dt.date
 
-# Fraction of bikes not docked (in use)
-station_data["frac_not_docked"] = (
-    (station_data["BIKE_STANDS"] - station_data["AVAILABLE_BIKES"]) / station_data["BIKE_STANDS"]
-)
+    # Fraction of bikes not docked (in use)
+    station_data["frac_not_docked"] = (
+        (station_data["BIKE_STANDS"] - station_data["AVAILABLE_BIKES"]) / station_data["BIKE_STANDS"]
+    )
 
-# Daily summary for January
-daily_summary = station_data.groupby('day')['frac_not_docked'].mean()
+    # Daily summary for January
+    return station_data.groupby('day')['frac_not_docked'].mean()
 
-### Plotting ###
-fig, ax = plt.subplots(figsize=(12, 6))
-ax.bar(daily_summary.index, daily_summary.values, width=0.8)
 
-ax.set_xlabel('Day in January')
-ax.set_ylabel('Fraction of Bikes Not Docked (in use)')
-ax.set_title(f'Daily Bike Usage for Station {station_id} in January {year}')
-fig.autofmt_xdate()  # Rotate date labels for readability
-fig.tight_layout()
+def plot_daily_summary(daily_summary: pd.Series, station_id: int, year: int) -> str:
+    import matplotlib.pyplot as plt
 
-path = f'graphs/station_{station_id}_daily_january_{year}.png'
-fig.savefig(path)
-plt.close(fig)
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(daily_summary.index, daily_summary.values, width=0.8)
 
-print(f"Saved January daily histogram: {path}")
\ No newline at end of file
+    ax.set_xlabel('Day in January')
+    ax.set_ylabel('Fraction of Bikes Not Docked (in use)')
+    ax.set_title(f'Daily Bike Usage for Station {station_id} in January {year}')
+    fig.autofmt_xdate()  # Rotate date labels for readability
+    fig.tight_layout()
+
+    os.makedirs('graphs', exist_ok=True)
+    path = f'graphs/station_{station_id}_daily_january_{year}.png'
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description='Daily bike usage for one station in January'))
+    args = parse_export_args(parser=parser)
+
+    index = load_station_index('combined_cleaned.csv', exclude_anomalies=args.exclude_anomalies)
+
+    station_id = 21   # replace with actual station ID
+    year = 2023
+
+    daily_summary = january_daily_summary(index, station_id, year)
+
+    if args.export:
+        export_tables({f'station_{station_id}_daily_january_{year}': daily_summary.to_frame()}, args.export)
+    if args.headless:
+        return
+
+    path = plot_daily_summary(daily_summary, station_id, year)
+    print(f"Saved January daily histogram: {path}")
+
+
+if __name__ == '__main__':
+    main()
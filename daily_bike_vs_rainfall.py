@@ -1,59 +1,86 @@
+import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 
-# --- Bike usage data ---
-bike = pd.read_csv('combined_cleaned.csv')
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments
+from station_time_index import load_station_index, StationTimeIndex
 
-station_id = 32   # replace with your station ID
-year = 2023       # year to analyze
 
-# Filter for the chosen station and year
-bike_data = bike[(bike['STATION ID'] == station_id) & (bike['YEAR'] == year)]
-bike_data['TIME'] = pd.to_datetime(bike_data['TIME'])
+def merge_bike_and_rain(bike: StationTimeIndex, rain: pd.DataFrame, station_id: int, year: int) -> pd.DataFrame:
+    # January for the chosen station and year
+    bike_data = bike.month(station_id, year, 1).copy()
 
-# Restrict to January
-bike_data = bike_data[bike_data['TIME'].dt.month == 1]
+    # Create a daily column
+    bike_data['day'] = bike_data['TIME'].dt.date
 
-# Create a daily column
-bike_data['day'] = bike_data['TIME'].dt.date
+    # Fraction of bikes docked (NOT in use)
+    bike_data['frac_docked'] = bike_data['AVAILABLE_BIKES'] / bike_data['BIKE_STANDS']
 
-# Fraction of bikes docked (NOT in use)
-bike_data['frac_docked'] = bike_data['AVAILABLE_BIKES'] / bike_data['BIKE_STANDS']
+    # Daily average usage
+    daily_bike = bike_data.groupby('day')['frac_docked'].mean().reset_index()
+    daily_bike['day'] = pd.to_datetime(daily_bike['day'])  # ensure datetime type
 
-# Daily average usage
-daily_bike = bike_data.groupby('day')['frac_docked'].mean().reset_index()
-daily_bike['day'] = pd.to_datetime(daily_bike['day'])  # ensure datetime type
+    rain = rain.copy()
+    rain['date'] = pd.to_datetime(rain['date'])
 
-# --- Rainfall data ---
-rain = pd.read_csv('rainfall_2022_2023.csv')  # already cleaned and filtered
-rain['date'] = pd.to_datetime(rain['date'])
+    # Restrict to January
+    rain_jan = rain[rain['date'].dt.month == 1]
 
-# Restrict to January
-rain_jan = rain[rain['date'].dt.month == 1]
+    # --- Merge datasets on date ---
+    return pd.merge(daily_bike, rain_jan, left_on='day', right_on='date')
 
-# --- Merge datasets on date ---
-merged = pd.merge(daily_bike, rain_jan, left_on='day', right_on='date')
 
-# --- Plotting ---
-fig, ax1 = plt.subplots(figsize=(12, 6))
+def plot_bike_vs_rain(merged: pd.DataFrame, station_id: int, year: int) -> str:
+    import matplotlib.pyplot as plt
 
-# Bike usage (bar chart)
-ax1.bar(merged['day'], merged['frac_docked'], color='tab:blue', alpha=0.6)
-ax1.set_xlabel('Day in January')
-ax1.set_ylabel('Fraction of Bikes Docked (NOT in use)', color='tab:blue')
+    fig, ax1 = plt.subplots(figsize=(12, 6))
 
-# Rainfall (line chart on secondary axis)
-ax2 = ax1.twinx()
-ax2.plot(merged['day'], merged['rain'], color='tab:green', marker='o')
-ax2.set_ylabel('Rainfall (mm)', color='tab:green')
+    # Bike usage (bar chart)
+    ax1.bar(merged['day'], merged['frac_docked'], color='tab:blue', alpha=0.6)
+    ax1.set_xlabel('Day in January')
+    ax1.set_ylabel('Fraction of Bikes Docked (NOT in use)', color='tab:blue')
 
-plt.title(f'Bike Docking vs Rainfall (Station {station_id}, January {year})')
-fig.autofmt_xdate()
-fig.tight_layout()
+    # Rainfall (line chart on secondary axis)
+    ax2 = ax1.twinx()
+    ax2.plot(merged['day'], merged['rain'], color='tab:green', marker='o')
+    ax2.set_ylabel('Rainfall (mm)', color='tab:green')
 
-# Save plot
-path = f'graphs/station_{station_id}_bike_docked_vs_rainfall_january_{year}.png'
-fig.savefig(path)
-plt.close(fig)
+    plt.title(f'Bike Docking vs Rainfall (Station {station_id}, January {year})')
+    fig.autofmt_xdate()
+    fig.tight_layout()
 
-print(f"Saved January bike docking vs rainfall plot: {path}")
\ No newline at end of file
+    # Save plot
+    os.makedirs('graphs', exist_ok=True)
+    path = f'graphs/station_{station_id}_bike_docked_vs_rainfall_january_{year}.png'
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description='Daily bike docking vs rainfall for one station in January'))
+    args = parse_export_args(parser=parser)
+
+    # --- Bike usage data ---
+    bike = load_station_index('combined_cleaned.csv', exclude_anomalies=args.exclude_anomalies)
+
+    # --- Rainfall data ---
+    rain = pd.read_csv('rainfall_2022_2023.csv')  # already cleaned and filtered
+
+    station_id = 32   # replace with your station ID
+    year = 2023       # year to analyze
+
+    merged = merge_bike_and_rain(bike, rain, station_id, year)
+
+    if args.export:
+        export_tables({f'station_{station_id}_bike_docked_vs_rainfall_january_{year}': merged}, args.export)
+    if args.headless:
+        return
+
+    path = plot_bike_vs_rain(merged, station_id, year)
+    print(f"Saved January bike docking vs rainfall plot: {path}")
+
+
+if __name__ == '__main__':
+    main()
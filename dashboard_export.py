@@ -0,0 +1,274 @@
+# Export a self-contained interactive HTML dashboard covering every station and period.
+#
+# The dashboard is built from the same precomputed aggregates as the PNG reports and the query
+# service (build_availability_aggregates.build_aggregates): near-empty / near-full counts by
+# hour_bin x day_category and by academic period, and 30-minute time-of-day profiles. Long
+# AVAILABLE_BIKES time series are reduced to display resolution with a min/max envelope per
+# pixel bucket, which keeps every empty/full extreme visible while capping each station's series
+# at 2 x DISPLAY_WIDTH points however many years of snapshots there are.
+#
+# Everything (data, styles, script) is inlined into one HTML file with no external requests.
+#
+#     python dashboard_export.py [combined csv] [-o dashboard/availability_dashboard.html]
+
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from build_availability_aggregates import INPUT_CSV, build_aggregates
+from time_features import HOUR_BINS, NEAR_EMPTY_THRESHOLD, NEAR_FULL_THRESHOLD
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+OUTPUT_PATH = os.path.join("dashboard", "availability_dashboard.html")
+DISPLAY_WIDTH = 1000   # pixel buckets per time-series chart
+
+PERIOD_ORDER = [
+    "teaching_weekday",
+    "teaching_weekend",
+    "reading_week",
+    "scholarship_exam",
+    "summer_exam",
+    "christmas_exam",
+    "christmas_closure",
+    "summer_weekday",
+    "summer_weekend",
+    "other_out_of_term",
+]
+
+
+def minmax_downsample(df: pd.DataFrame, value_col: str, buckets: int = DISPLAY_WIDTH) -> pd.DataFrame:
+    """
+    Keep only the minimum and maximum of value_col in each of `buckets` equal time buckets per
+    station, in time order. One vectorized groupby over all stations.
+    """
+    df = df[["STATION ID", "TIME", value_col]].dropna().reset_index(drop=True)
+    t = df["TIME"].astype("int64").to_numpy()
+    first = df.groupby("STATION ID")["TIME"].transform("min").astype("int64").to_numpy()
+    last = df.groupby("STATION ID")["TIME"].transform("max").astype("int64").to_numpy()
+    span = np.maximum(last - first, 1)
+    df["bucket"] = np.minimum(((t - first) / span * buckets).astype(int), buckets - 1)
+
+    grouped = df.groupby(["STATION ID", "bucket"])[value_col]
+    keep = np.union1d(grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy())
+    return df.loc[keep].drop(columns="bucket").sort_values(["STATION ID", "TIME"], kind="mergesort")
+
+
+def dashboard_data(df: pd.DataFrame, buckets: int = DISPLAY_WIDTH) -> dict:
+    df = df.copy()
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    aggregates = build_aggregates(df)
+
+    series = {}
+    for station, group in minmax_downsample(df, "AVAILABLE_BIKES", buckets).groupby("STATION ID"):
+        series[str(station)] = {
+            # epoch milliseconds (naive local time, rendered as such)
+            "t": ((group["TIME"] - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).tolist(),
+            "bikes": group["AVAILABLE_BIKES"].astype(int).tolist(),
+        }
+    capacity = df.groupby("STATION ID")["BIKE_STANDS"].max()
+
+    return {
+        "stations": [str(s) for s in sorted(df["STATION ID"].unique())],
+        "capacity": {str(s): int(c) for s, c in capacity.items()},
+        "hour_bins": [name for name, _, _ in HOUR_BINS],
+        "periods": PERIOD_ORDER,
+        "thresholds": {"near_empty": NEAR_EMPTY_THRESHOLD, "near_full": NEAR_FULL_THRESHOLD},
+        "series": series,
+        **aggregates,
+    }
+
+
+def write_dashboard(data: dict, path: str = OUTPUT_PATH):
+    payload = json.dumps(data, separators=(",", ":"), default=int).replace("</", "<\\/")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HTML_TEMPLATE.replace("__DATA__", payload))
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Dublin Bikes availability dashboard</title>
+<style>
+  body { font-family: sans-serif; margin: 20px; color: #222; }
+  .controls { display: flex; gap: 16px; margin-bottom: 12px; flex-wrap: wrap; }
+  .chart { margin: 8px 0 24px; }
+  .chart h3 { margin: 0 0 4px; font-size: 15px; }
+  svg { background: #fafafa; border: 1px solid #ddd; }
+  .axis { font-size: 11px; fill: #555; }
+  .legend { font-size: 12px; }
+  #tip { position: fixed; pointer-events: none; background: #fff; border: 1px solid #999;
+         padding: 3px 6px; font-size: 12px; display: none; }
+</style>
+</head>
+<body>
+<h2>Dublin Bikes availability</h2>
+<div class="controls">
+  <label>Station <select id="station"></select></label>
+  <label>Day type <select id="day"></select></label>
+</div>
+<div class="chart"><h3>P(near empty) / P(near full) by time of day</h3><svg id="hour" width="760" height="260"></svg></div>
+<div class="chart"><h3>P(near empty) / P(near full) by academic period</h3><svg id="period" width="760" height="300"></svg></div>
+<div class="chart"><h3>Mean fraction of bikes docked by 30-minute slot</h3><svg id="slot" width="1000" height="240"></svg></div>
+<div class="chart"><h3>Available bikes over time (min/max per pixel)</h3><svg id="series" width="1000" height="260"></svg></div>
+<div id="tip"></div>
+<script>
+const DATA = __DATA__;
+const NS = "http://www.w3.org/2000/svg";
+const COLORS = { near_empty: "#d9534f", near_full: "#337ab7", line: "#2a7f62" };
+const M = { l: 44, r: 10, t: 10, b: 60 };
+
+function el(tag, attrs, parent, text) {
+  const e = document.createElementNS(NS, tag);
+  for (const k in attrs) e.setAttribute(k, attrs[k]);
+  if (text !== undefined) e.textContent = text;
+  if (parent) parent.appendChild(e);
+  return e;
+}
+
+const tip = document.getElementById("tip");
+function hover(e, text) {
+  e.addEventListener("mousemove", ev => {
+    tip.style.display = "block"; tip.style.left = (ev.clientX + 12) + "px"; tip.style.top = (ev.clientY + 12) + "px";
+    tip.textContent = text;
+  });
+  e.addEventListener("mouseleave", () => { tip.style.display = "none"; });
+}
+
+function yAxis(svg, h, max, fmt) {
+  for (let i = 0; i <= 4; i++) {
+    const v = max * i / 4, y = M.t + (h - M.t - M.b) * (1 - i / 4);
+    el("line", { x1: M.l, x2: svg.width.baseVal.value - M.r, y1: y, y2: y, stroke: "#e4e4e4" }, svg);
+    el("text", { x: M.l - 4, y: y + 3, "text-anchor": "end", class: "axis" }, svg, fmt(v));
+  }
+}
+
+// Pool counts over every record matching the filters (all stations when station is "all")
+function pooled(records, filters, key) {
+  const out = {};
+  for (const r of records) {
+    let ok = true;
+    for (const f in filters) if (filters[f] !== "all" && String(r[f]) !== filters[f]) ok = false;
+    if (!ok) continue;
+    const o = out[r[key]] || (out[r[key]] = { near_empty: 0, near_full: 0, n: 0 });
+    o.near_empty += r.near_empty_count; o.near_full += r.near_full_count; o.n += r.n;
+  }
+  return out;
+}
+
+function groupedBars(svg, categories, counts) {
+  svg.innerHTML = "";
+  const w = svg.width.baseVal.value, h = svg.height.baseVal.value;
+  const probs = categories.map(c => counts[c] ? [counts[c].near_empty / counts[c].n, counts[c].near_full / counts[c].n] : [0, 0]);
+  const max = Math.max(0.05, ...probs.flat()) * 1.1;
+  yAxis(svg, h, max, v => v.toFixed(2));
+  const band = (w - M.l - M.r) / categories.length, bw = band * 0.35;
+  categories.forEach((c, i) => {
+    ["near_empty", "near_full"].forEach((ev, j) => {
+      const p = probs[i][j], bh = (h - M.t - M.b) * p / max;
+      const x = M.l + i * band + band * 0.15 + j * bw;
+      const bar = el("rect", { x: x, y: h - M.b - bh, width: bw, height: bh, fill: COLORS[ev] }, svg);
+      hover(bar, c + " " + ev + ": " + (100 * p).toFixed(1) + "% (n=" + (counts[c] ? counts[c].n : 0) + ")");
+    });
+    el("text", { x: M.l + i * band + band / 2, y: h - M.b + 14, "text-anchor": "end", class: "axis",
+                 transform: "rotate(-30 " + (M.l + i * band + band / 2) + " " + (h - M.b + 14) + ")" }, svg, c);
+  });
+  el("text", { x: w - 200, y: 20, class: "legend", fill: COLORS.near_empty }, svg, "■ near empty (≤" + DATA.thresholds.near_empty + " bikes)");
+  el("text", { x: w - 200, y: 36, class: "legend", fill: COLORS.near_full }, svg, "■ near full (≤" + DATA.thresholds.near_full + " stands)");
+}
+
+function slotProfile(svg, station) {
+  svg.innerHTML = "";
+  const w = svg.width.baseVal.value, h = svg.height.baseVal.value;
+  const bySlot = {};
+  for (const r of DATA.time_of_day) {
+    if (station !== "all" && String(r["STATION ID"]) !== station) continue;
+    (bySlot[r.time_of_day] || (bySlot[r.time_of_day] = [])).push(r.frac_docked);
+  }
+  const slots = Object.keys(bySlot).sort();
+  yAxis(svg, h, 1, v => v.toFixed(2));
+  const band = (w - M.l - M.r) / Math.max(slots.length, 1);
+  slots.forEach((s, i) => {
+    const v = bySlot[s].reduce((a, b) => a + b, 0) / bySlot[s].length, bh = (h - M.t - M.b) * v;
+    hover(el("rect", { x: M.l + i * band + 1, y: h - M.b - bh, width: band - 2, height: bh, fill: "#7fb3d5" }, svg), s + ": " + v.toFixed(3));
+    if (i % 4 === 0) el("text", { x: M.l + i * band, y: h - M.b + 14, class: "axis" }, svg, s);
+  });
+}
+
+function timeSeries(svg, station) {
+  svg.innerHTML = "";
+  const w = svg.width.baseVal.value, h = svg.height.baseVal.value;
+  const stations = station === "all" ? DATA.stations : [station];
+  let t0 = Infinity, t1 = -Infinity, max = 1;
+  for (const s of stations) {
+    const d = DATA.series[s]; if (!d || !d.t.length) continue;
+    t0 = Math.min(t0, d.t[0]); t1 = Math.max(t1, d.t[d.t.length - 1]); max = Math.max(max, DATA.capacity[s]);
+  }
+  if (!isFinite(t0)) return;
+  yAxis(svg, h, max, v => v.toFixed(0));
+  const x = t => M.l + (w - M.l - M.r) * (t - t0) / Math.max(t1 - t0, 1);
+  const y = v => M.t + (h - M.t - M.b) * (1 - v / max);
+  const palette = ["#2a7f62", "#d9534f", "#337ab7", "#f0ad4e", "#8e44ad", "#555"];
+  stations.forEach((s, k) => {
+    const d = DATA.series[s]; if (!d) return;
+    const pts = d.t.map((t, i) => x(t).toFixed(1) + "," + y(d.bikes[i]).toFixed(1)).join(" ");
+    const line = el("polyline", { points: pts, fill: "none", stroke: palette[k % palette.length], "stroke-width": 1 }, svg);
+    hover(line, "Station " + s);
+  });
+  for (let i = 0; i <= 6; i++) {
+    const t = t0 + (t1 - t0) * i / 6;
+    el("text", { x: x(t), y: h - M.b + 14, "text-anchor": "middle", class: "axis" }, svg, new Date(t).toISOString().slice(0, 10));
+  }
+  el("line", { x1: M.l, x2: w - M.r, y1: y(DATA.thresholds.near_empty), y2: y(DATA.thresholds.near_empty), stroke: COLORS.near_empty, "stroke-dasharray": "4 3" }, svg);
+}
+
+function render() {
+  const station = document.getElementById("station").value;
+  const day = document.getElementById("day").value;
+  groupedBars(document.getElementById("hour"), DATA.hour_bins,
+              pooled(DATA.hour_bin, { "STATION ID": station, day_category: day }, "hour_bin"));
+  groupedBars(document.getElementById("period"), DATA.periods.filter(p => DATA.period.some(r => r.period === p)),
+              pooled(DATA.period, { "STATION ID": station }, "period"));
+  slotProfile(document.getElementById("slot"), station);
+  timeSeries(document.getElementById("series"), station);
+}
+
+function fill(id, values, labels) {
+  const s = document.getElementById(id);
+  values.forEach((v, i) => { const o = document.createElement("option"); o.value = v; o.textContent = labels[i]; s.appendChild(o); });
+  s.addEventListener("change", render);
+}
+
+fill("station", ["all"].concat(DATA.stations), ["All stations"].concat(DATA.stations.map(s => "Station " + s)));
+const days = Array.from(new Set(DATA.hour_bin.map(r => r.day_category))).sort();
+fill("day", ["all"].concat(days), ["All days"].concat(days));
+render();
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Export an interactive HTML dashboard"))
+    parser.add_argument("input_csv", nargs="?", default=INPUT_CSV)
+    parser.add_argument("-o", "--output", default=OUTPUT_PATH)
+    parser.add_argument("--width", type=int, default=DISPLAY_WIDTH, help="pixel buckets per time series")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input_csv)
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+
+    data = dashboard_data(df, args.width)
+    write_dashboard(data, args.output)
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"Saved dashboard ({size_kb:.0f} KB, {len(data['stations'])} stations) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,14 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 
-df = pd.read_csv('combined_cleaned.csv')
-df['TIME'] = pd.to_datetime(df['TIME'])
-df['month'] = df['TIME'].dt.month
-
-df['frac_not_docked'] = (df['BIKE_STANDS'] - df['AVAILABLE_BIKES']) / df['BIKE_STANDS']
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
 
 term_months = list(range(9, 13)) + list(range(1, 6))
 
-os.makedirs('graphs', exist_ok=True)
-
-for year in [2022, 2023]:
-    print(f"Processing year {year}...")
 
+def term_summary(df: pd.DataFrame, year: int) -> pd.DataFrame:
     yearly = df[df['YEAR'] == year]
     summaries = []
 
@@ -23,7 +17,11 @@ for year in [2022, 2023]:
         out = name[~name['month'].isin(term_months)]['frac_not_docked'].mean()
         summaries.append((station, term, out))
 
-    summ_df = pd.DataFrame(summaries, columns=['station', 'term', 'out'])
+    return pd.DataFrame(summaries, columns=['station', 'term', 'out'])
+
+
+def plot_term_summary(summ_df: pd.DataFrame, year: int) -> str:
+    import matplotlib.pyplot as plt
 
     fig, ax = plt.subplots(figsize=(8, 5))
     x = range(len(summ_df))
@@ -38,10 +36,42 @@ for year in [2022, 2023]:
     ax.legend()
     fig.tight_layout()
 
+    os.makedirs('graphs', exist_ok=True)
     path = f'graphs/bike_not_docked_{year}.png'
     fig.savefig(path)
     plt.close(fig)
+    return path
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description='Bike usage in vs out of term time'))
+    args = parse_export_args(parser=parser)
+
+    df = pd.read_csv('combined_cleaned.csv')
+    # Closures and outages would otherwise skew the term vs out-of-term means
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+    df['TIME'] = pd.to_datetime(df['TIME'])
+    df['month'] = df['TIME'].dt.month
+
+    df['frac_not_docked'] = (df['BIKE_STANDS'] - df['AVAILABLE_BIKES']) / df['BIKE_STANDS']
+
+    summaries = {}
+    for year in [2022, 2023]:
+        print(f"Processing year {year}...")
+        summaries[year] = term_summary(df, year)
+
+    if args.export:
+        export_tables({f'bike_not_docked_{year}': summ_df for year, summ_df in summaries.items()}, args.export)
+    if args.headless:
+        return
+
+    for year, summ_df in summaries.items():
+        path = plot_term_summary(summ_df, year)
+        print(f"Saved graph: {path}")
+
+    print("Done.")
 
-    print(f"Saved graph: {path}")
 
-print("Done.")
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,10 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import date
-
-#load data
-df = pd.read_csv("combined_cleaned.csv")
-df["TIME"] = pd.to_datetime(df["TIME"])
-df = df[(df["TIME"] >= "2022-01-01") & (df["TIME"] <= "2023-12-31")]
-df["date"] = df["TIME"].dt.date
-df["weekday"] = df["TIME"].dt.weekday  # 0=Mon, 6=Sun
-
-df["frac_not_docked"] = (df["BIKE_STANDS"] - df["AVAILABLE_BIKES"]) / df["BIKE_STANDS"]
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments
+from station_time_index import load_station_index
 
 # date range func
 def d_range(s, e):
@@ -89,58 +83,71 @@ def assign_category(row):
         return "summer"
     return "other_out_of_term"
 
-df["category"] = df.apply(assign_category, axis=1)
+# comparisons: (title, categories, filename)
+COMPARISONS = [
+    # 1. Term weekdays vs Summer
+    ("Term Weekdays vs Summer (Bike Usage)", ["term_weekday", "summer"], "term_weekdays_vs_summer"),
+    # 2. Term weekends vs Summer
+    ("Term Weekends vs Summer (Bike Usage)", ["term_weekend", "summer"], "term_weekends_vs_summer"),
+    # 3. Reading Week vs Term Weekdays
+    ("Reading Week vs Term Weekdays", ["reading_week", "term_weekday"], "reading_week_vs_term"),
+    # 4. Exam periods vs Term Weekdays
+    (
+        "Exam Periods vs Term Weekdays",
+        ["scholarship_exam", "christmas_exam", "summer_exam", "term_weekday"],
+        "exams_vs_term",
+    ),
+    # 5. Christmas Closure vs Term Weekdays
+    ("Christmas Closure vs Term Weekdays", ["christmas_closure", "term_weekday"], "christmas_closure_vs_term"),
+]
+
+
+# station x category means for one comparison
+def category_means(df, categories):
+    subset = df[df["category"].isin(categories)]
+    return subset.groupby(["STATION ID", "category"])["frac_not_docked"].mean().unstack()
 
-os.makedirs("graphs", exist_ok=True)
 
 # plotting func
-def plot_availability(title, categories, filename):
-    subset = df[df["category"].isin(categories)]
-    grouped = subset.groupby(["STATION ID", "category"])["frac_not_docked"].mean().unstack()
+def plot_availability(grouped, title, filename):
+    import matplotlib.pyplot as plt
 
     fig, ax = plt.subplots(figsize=(10, 6))
     grouped.plot(kind="bar", ax=ax)
     ax.set_title(title)
     ax.set_ylabel("Fraction of Bikes Not Docked (in use)")
     fig.tight_layout()
+    os.makedirs("graphs", exist_ok=True)
     fig.savefig(f"graphs/{filename}.png")
     plt.close(fig)
 
-# make graphs
 
-# 1. Term weekdays vs Summer
-plot_availability(
-    "Term Weekdays vs Summer (Bike Usage)",
-    ["term_weekday", "summer"],
-    "term_weekdays_vs_summer"
-)
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Bike usage by academic calendar period"))
+    args = parse_export_args(parser=parser)
 
-# 2. Term weekends vs Summer
-plot_availability(
-    "Term Weekends vs Summer (Bike Usage)",
-    ["term_weekend", "summer"],
-    "term_weekends_vs_summer"
-)
+    #load data
+    index = load_station_index("combined_cleaned.csv", exclude_anomalies=args.exclude_anomalies)
+    df = index.select(start="2022-01-01", end="2023-12-31").copy()
+    df["date"] = df["TIME"].dt.date
+    df["weekday"] = df["TIME"].dt.weekday  # 0=Mon, 6=Sun
 
-# 3. Reading Week vs Term Weekdays
-plot_availability(
-    "Reading Week vs Term Weekdays",
-    ["reading_week", "term_weekday"],
-    "reading_week_vs_term"
-)
+    df["frac_not_docked"] = (df["BIKE_STANDS"] - df["AVAILABLE_BIKES"]) / df["BIKE_STANDS"]
+    df["category"] = df.apply(assign_category, axis=1)
 
-# 4. Exam periods vs Term Weekdays
-plot_availability(
-    "Exam Periods vs Term Weekdays",
-    ["scholarship_exam", "christmas_exam", "summer_exam", "term_weekday"],
-    "exams_vs_term"
-)
+    tables = {filename: category_means(df, categories) for _, categories, filename in COMPARISONS}
+
+    if args.export:
+        export_tables(tables, args.export)
+    if args.headless:
+        return
+
+    # make graphs
+    for title, _, filename in COMPARISONS:
+        plot_availability(tables[filename], title, filename)
+
+    print("All graphs generated in ./graphs/")
 
-# 5. Christmas Closure vs Term Weekdays
-plot_availability(
-    "Christmas Closure vs Term Weekdays",
-    ["christmas_closure", "term_weekday"],
-    "christmas_closure_vs_term"
-)
 
-print("All graphs generated in ./graphs/")
+if __name__ == "__main__":
+    main()
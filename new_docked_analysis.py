@@ -1,31 +1,57 @@
 # Histogram showing percentage of bikes over the course of the Michaelmas term.
 
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 
-df = pd.read_csv('combined_cleaned.csv')
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments
+from station_time_index import load_station_index, StationTimeIndex
 
-station_id = 98   # replace with actual station ID
-year = 2023
-station_data = df[(df['STATION ID'] == station_id) & (df['YEAR'] == year)]
-station_data['TIME'] = pd.to_datetime(station_data['TIME'])
-station_data['week'] = station_data['TIME'].dt.isocalendar().week
-station_data["frac_not_docked"] = (station_data["BIKE_STANDS"] - station_data["AVAILABLE_BIKES"]) / station_data["BIKE_STANDS"]
-weekly_summary = station_data.groupby('week')['frac_not_docked'].mean()
 
-###
+def weekly_summary(index: StationTimeIndex, station_id: int, year: int) -> pd.Series:
+    station_data = index.year(station_id, year).copy()
+    station_data['week'] = station_data['TIME'].dt.isocalendar().week
+    station_data["frac_not_docked"] = (station_data["BIKE_STANDS"] - station_data["AVAILABLE_BIKES"]) / station_data["BIKE_STANDS"]
+    return station_data.groupby('week')['frac_not_docked'].mean()
 
-fig, ax = plt.subplots(figsize=(12, 6))
-ax.bar(weekly_summary.index, weekly_summary.values, width=0.8)
 
-ax.set_xlabel('Week of Year')
-ax.set_ylabel('Fraction of Bikes Not Docked (in use)')
-ax.set_title(f'Weekly Bike Usage for Station {station_id} in {year}')
-fig.tight_layout()
+def plot_weekly_summary(summary: pd.Series, station_id: int, year: int) -> str:
+    import matplotlib.pyplot as plt
 
-path = f'graphs/station_{station_id}_weekly_{year}.png'
-fig.savefig(path)
-plt.close(fig)
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(summary.index, summary.values, width=0.8)
 
-print(f"Saved weekly histogram: {path}")
\ No newline at end of file
+    ax.set_xlabel('Week of Year')
+    ax.set_ylabel('Fraction of Bikes Not Docked (in use)')
+    ax.set_title(f'Weekly Bike Usage for Station {station_id} in {year}')
+    fig.tight_layout()
+
+    os.makedirs('graphs', exist_ok=True)
+    path = f'graphs/station_{station_id}_weekly_{year}.png'
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description='Weekly bike usage for one station over a year'))
+    args = parse_export_args(parser=parser)
+
+    index = load_station_index('combined_cleaned.csv', exclude_anomalies=args.exclude_anomalies)
+
+    station_id = 98   # replace with actual station ID
+    year = 2023
+    summary = weekly_summary(index, station_id, year)
+
+    if args.export:
+        export_tables({f'station_{station_id}_weekly_{year}': summary.to_frame()}, args.export)
+    if args.headless:
+        return
+
+    path = plot_weekly_summary(summary, station_id, year)
+    print(f"Saved weekly histogram: {path}")
+
+
+if __name__ == '__main__':
+    main()
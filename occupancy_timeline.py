@@ -0,0 +1,218 @@
+# Change-event (run-length) occupancy timeline with duration-weighted statistics.
+#
+# Roughly half of consecutive 30-minute snapshots for a station repeat the previous counts, and
+# snapshot-count probabilities over-weight periods that happen to be sampled more densely. The
+# timeline keeps one row per station per change in AVAILABLE_BIKES / AVAILABLE_BIKE_STANDS /
+# BIKE_STANDS, with the interval [start, end) during which those counts held:
+#
+#   - start is the station's LAST UPDATED time when it falls between the previous snapshot and
+#     this one (i.e. it dates the change), otherwise the snapshot TIME
+#   - end is the next change, or the last snapshot before a gap longer than MAX_GAP, or the
+#     station's final snapshot
+#
+# Statistics are computed by splitting the intervals only where they cross a grid boundary (the
+# hour-bin edges of each day, or 30-minute slots for time-of-day profiles) and weighting each
+# piece by its duration, so the cost scales with the number of changes plus the grid, not with
+# the number of snapshots.
+#
+#     python occupancy_timeline.py [--headless] [--export csv]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from time_features import (
+    HOUR_BINS,
+    NEAR_EMPTY_THRESHOLD,
+    NEAR_FULL_THRESHOLD,
+    label_hour_bins,
+    label_day_category,
+    add_time_features,
+)
+from availability_probability_analysis import compute_probabilities, plot_probability_bar
+from availability_by_academic_period import assign_period
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+INPUT_CSV = "combined_cleaned_near_accommodation.csv"
+
+MAX_GAP = pd.Timedelta(hours=2)   # longer gaps between snapshots end the current interval
+SLOT = pd.Timedelta(minutes=30)
+
+COUNT_COLUMNS = ["AVAILABLE_BIKES", "AVAILABLE_BIKE_STANDS", "BIKE_STANDS"]
+
+
+def build_timeline(df: pd.DataFrame, max_gap: pd.Timedelta = MAX_GAP) -> pd.DataFrame:
+    """Collapse snapshots into change events: STATION ID, start, end and the counts held."""
+    df = df[["STATION ID", "TIME", "LAST UPDATED"] + COUNT_COLUMNS].copy()
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    df["LAST UPDATED"] = pd.to_datetime(df["LAST UPDATED"], errors="coerce")
+    df = df.sort_values(["STATION ID", "TIME"], kind="mergesort").reset_index(drop=True)
+
+    station = df["STATION ID"].to_numpy()
+    time = df["TIME"].to_numpy()
+    last_updated = df["LAST UPDATED"].to_numpy()
+    counts = df[COUNT_COLUMNS].to_numpy()
+
+    new_station = np.r_[True, station[1:] != station[:-1]]
+    prev_time = np.r_[time[:1], time[:-1]]
+    after_gap = ~new_station & (time - prev_time > max_gap.to_timedelta64())
+    changed = np.r_[True, (counts[1:] != counts[:-1]).any(axis=1)]
+    is_event = new_station | after_gap | changed
+
+    # Date a change by LAST UPDATED when it lies between the two snapshots that bracket it
+    dated = ~new_station & ~after_gap & (last_updated > prev_time) & (last_updated <= time)
+    start = np.where(dated, last_updated, time)
+
+    rows = np.flatnonzero(is_event)
+    next_rows = np.r_[rows[1:], len(df)]
+    next_clipped = np.minimum(next_rows, len(df) - 1)
+    # The interval runs to the next event, unless that event starts a new station or follows a
+    # gap, in which case it stops at the last snapshot actually observed
+    open_ended = (next_rows == len(df)) | new_station[next_clipped] | after_gap[next_clipped]
+    end = np.where(open_ended, time[next_rows - 1], start[next_clipped])
+
+    events = pd.DataFrame({"STATION ID": station[rows], "start": start[rows], "end": end})
+    events[COUNT_COLUMNS] = counts[rows]
+    return events
+
+
+def split_at_grid(events: pd.DataFrame, grid: np.ndarray) -> pd.DataFrame:
+    """
+    Cut each [start, end) interval where it crosses a boundary of the sorted grid. Returns one row
+    per piece with the grid cell it falls in (cell_start) and its duration in seconds.
+    """
+    start = events["start"].to_numpy()
+    end = events["end"].to_numpy()
+    first = np.searchsorted(grid, start, side="right") - 1
+    last = np.searchsorted(grid, end, side="left") - 1
+    pieces = np.where(end > start, last - first + 1, 0)
+
+    owner = np.repeat(np.arange(len(events)), pieces)
+    cell = np.repeat(first, pieces) + (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces))
+    cell_start = grid[cell]
+    cell_end = np.r_[grid, np.datetime64("NaT")][cell + 1]
+    piece_start = np.maximum(start[owner], cell_start)
+    piece_end = np.where(np.isnat(cell_end), end[owner], np.minimum(end[owner], cell_end))
+
+    split = events.iloc[owner].drop(columns=["start", "end"]).reset_index(drop=True)
+    split["cell_start"] = cell_start
+    split["duration"] = (piece_end - piece_start) / np.timedelta64(1, "s")
+    return split
+
+
+def day_grid(events: pd.DataFrame, offsets) -> np.ndarray:
+    """Grid of boundaries at the given offsets from midnight on every day the events cover."""
+    first_day = events["start"].min().normalize()
+    days = pd.date_range(first_day, events["end"].max().normalize(), freq="D").to_numpy()
+    offsets = np.array([pd.Timedelta(o).to_timedelta64() for o in offsets])
+    return np.sort((days[:, None] + offsets[None, :]).ravel())
+
+
+def add_cell_features(split: pd.DataFrame) -> pd.DataFrame:
+    """Same labels as add_time_features / assign_period, computed once per grid cell."""
+    cell = pd.DatetimeIndex(split["cell_start"])
+    split["hour_bin"] = label_hour_bins(cell)
+    split["date"] = cell.date
+    split["day_category"] = label_day_category(cell)
+    split["peak_status"] = np.where(split["hour_bin"].isin(["morning_peak", "evening_peak"]), "peak", "off_peak")
+
+    unique_dates = pd.Series(pd.unique(split["date"]))
+    periods = {d: assign_period(d, d.weekday()) for d in unique_dates}
+    split["period"] = split["date"].map(periods)
+    split["time_of_day"] = cell.strftime("%H:%M")
+    split["near_empty"] = split["AVAILABLE_BIKES"] <= NEAR_EMPTY_THRESHOLD
+    split["near_full"] = split["AVAILABLE_BIKE_STANDS"] <= NEAR_FULL_THRESHOLD
+    return split
+
+
+def hour_bin_pieces(events: pd.DataFrame) -> pd.DataFrame:
+    """Events split at the hour-bin edges of every day, labelled with the usual time features."""
+    edges = sorted({start for _, start, _ in HOUR_BINS})
+    return add_cell_features(split_at_grid(events, day_grid(events, [f"{h}h" for h in edges])))
+
+
+def compute_weighted_probabilities(pieces: pd.DataFrame, group_cols, event_col: str) -> pd.DataFrame:
+    """Share of observed time each group spends in the event (cf. compute_probabilities)."""
+    pieces = pieces.assign(event_seconds=pieces["duration"] * pieces[event_col])
+    grouped = pieces.groupby(group_cols)[["event_seconds", "duration"]].sum().reset_index()
+    grouped["prob"] = grouped["event_seconds"] / grouped["duration"]
+    grouped["event_hours"] = grouped.pop("event_seconds") / 3600
+    grouped["observed_hours"] = grouped.pop("duration") / 3600
+    return grouped
+
+
+def weighted_time_of_day_profile(events: pd.DataFrame) -> pd.DataFrame:
+    """Duration-weighted mean fraction docked per station and 30-minute slot."""
+    slots = [SLOT * i for i in range(int(pd.Timedelta(days=1) / SLOT))]
+    split = split_at_grid(events, day_grid(events, slots))
+    split["time_of_day"] = pd.DatetimeIndex(split["cell_start"]).strftime("%H:%M")
+    split["docked_seconds"] = split["duration"] * split["AVAILABLE_BIKES"] / split["BIKE_STANDS"]
+    grouped = split.groupby(["STATION ID", "time_of_day"])[["docked_seconds", "duration"]].sum()
+    grouped["frac_docked"] = grouped["docked_seconds"] / grouped["duration"]
+    grouped["observed_hours"] = grouped["duration"] / 3600
+    return grouped[["frac_docked", "observed_hours"]].reset_index()
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Duration-weighted availability from change events"))
+    args = parse_export_args(parser=parser)
+
+    df = pd.read_csv(INPUT_CSV)
+    if args.exclude_anomalies:
+        df = drop_anomalous_days(df)
+
+    events = build_timeline(df)
+    print(f"Collapsed {len(df)} snapshots into {len(events)} change events ({len(events) / len(df):.1%})")
+
+    pieces = hour_bin_pieces(events)
+    near_empty_hour = compute_weighted_probabilities(pieces, ["hour_bin", "day_category"], "near_empty")
+    near_full_hour = compute_weighted_probabilities(pieces, ["hour_bin", "day_category"], "near_full")
+    near_empty_period = compute_weighted_probabilities(pieces, ["STATION ID", "period"], "near_empty")
+    near_full_period = compute_weighted_probabilities(pieces, ["STATION ID", "period"], "near_full")
+    profile = weighted_time_of_day_profile(events)
+
+    # How far the snapshot-count estimates are from the duration-weighted ones
+    snapshot = compute_probabilities(add_time_features(df), ["hour_bin", "day_category"], "near_empty")
+    compared = near_empty_hour.merge(snapshot, on=["hour_bin", "day_category"], suffixes=("", "_snapshot"))
+    print(f"Max |P(near empty) weighted - snapshot| across hour bins: {(compared['prob'] - compared['prob_snapshot']).abs().max():.4f}")
+
+    if args.export:
+        export_tables(
+            {
+                "occupancy_events": events,
+                "near_empty_by_hour_daytype_duration_weighted": near_empty_hour,
+                "near_full_by_hour_daytype_duration_weighted": near_full_hour,
+                "near_empty_by_academic_period_duration_weighted": near_empty_period,
+                "near_full_by_academic_period_duration_weighted": near_full_period,
+                "mean_fraction_docked_by_slot_duration_weighted": profile,
+            },
+            args.export,
+        )
+    if args.headless:
+        return
+
+    plot_probability_bar(
+        near_empty_hour,
+        x="hour_bin",
+        hue="day_category",
+        value="prob",
+        title="Share of Time Near-Empty by Time of Day near Accommodation (duration-weighted)",
+        ylabel="Share of time with available bikes <= 2",
+        filename="near_empty_by_hour_daytype_duration_weighted_near_accommodation.png",
+    )
+    plot_probability_bar(
+        near_full_hour,
+        x="hour_bin",
+        hue="day_category",
+        value="prob",
+        title="Share of Time Near-Full by Time of Day near Accommodation (duration-weighted)",
+        ylabel="Share of time with free stands <= 2",
+        filename="near_full_by_hour_daytype_duration_weighted_near_accommodation.png",
+    )
+    print("Graphs saved to ./graphs.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Stream raw monthly dumps straight out of compressed archives for clean_data.py.
+#
+# Supported inputs in uncleaned_csv/: plain .csv, .csv.gz, .csv.xz, .csv.bz2 and .zip archives
+# (every .csv member of a zip is read). Files are decompressed on the fly and parsed in chunks,
+# so nothing is ever extracted to disk and only one chunk is held in memory at a time.
+#
+# Each file's header line is sniffed first and known column-name variants (e.g. "Station ID",
+# "station_id", "number", "HARVEST_TIME", "lat") are mapped onto the canonical schema used by
+# cleaned_csv/, so files with drifted headers are cleaned instead of skipped.
+
+import io
+import re
+import csv
+import bz2
+import gzip
+import lzma
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+CHUNK_ROWS = 250_000
+
+# Canonical column -> accepted variants, compared after normalise_column_name()
+COLUMN_ALIASES = {
+    "STATION ID": ["STATIONID", "STATION", "NUMBER", "STATIONNUMBER"],
+    "TIME": ["TIME", "HARVESTTIME", "TIMESTAMP", "DATETIME"],
+    "LAST UPDATED": ["LASTUPDATED", "LASTUPDATE"],
+    "NAME": ["NAME", "STATIONNAME"],
+    "BIKE_STANDS": ["BIKESTANDS", "STANDS", "CAPACITY"],
+    "AVAILABLE_BIKE_STANDS": ["AVAILABLEBIKESTANDS", "AVAILABLESTANDS", "FREESTANDS"],
+    "AVAILABLE_BIKES": ["AVAILABLEBIKES", "BIKES"],
+    "STATUS": ["STATUS"],
+    "ADDRESS": ["ADDRESS"],
+    "LATITUDE": ["LATITUDE", "LAT"],
+    "LONGITUDE": ["LONGITUDE", "LNG", "LON", "LONG"],
+}
+
+_ALIAS_LOOKUP = {alias: canonical for canonical, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+# Suffix -> opener returning a binary file object that decompresses as it is read
+_OPENERS = {
+    ".csv": lambda path: open(path, "rb"),
+    ".gz": gzip.open,
+    ".xz": lzma.open,
+    ".bz2": bz2.open,
+}
+
+
+def normalise_column_name(name: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", name.upper())
+
+
+def canonical_columns(header) -> dict:
+    """Rename map from the raw header to canonical column names (known columns only)."""
+    rename = {}
+    for column in header:
+        canonical = _ALIAS_LOOKUP.get(normalise_column_name(column))
+        if canonical is not None and canonical not in rename.values():
+            rename[column] = canonical
+    return rename
+
+
+def iter_raw_sources(input_dir: Path):
+    """
+    Yield (name, opener) for every raw CSV under input_dir, including members of zip archives.
+    `name` is the logical CSV file name (compression suffix removed); `opener()` returns a fresh
+    binary stream.
+    """
+    for path in sorted(input_dir.iterdir()):
+        suffix = path.suffix.lower()
+        if suffix == ".zip":
+            with zipfile.ZipFile(path) as archive:
+                members = [m for m in archive.namelist() if m.lower().endswith(".csv")]
+            for member in members:
+                yield Path(member).name, _zip_member_opener(path, member)
+        elif suffix in _OPENERS and (suffix == ".csv" or path.stem.lower().endswith(".csv")):
+            name = path.name if suffix == ".csv" else path.stem
+            yield name, _file_opener(path, suffix)
+
+
+def _file_opener(path: Path, suffix: str):
+    return lambda: _OPENERS[suffix](path)
+
+
+def _zip_member_opener(path: Path, member: str):
+    def opener():
+        # The member stream keeps the underlying file open after the archive object is closed
+        with zipfile.ZipFile(path) as archive:
+            return archive.open(member)
+
+    return opener
+
+
+def sniff_header(opener) -> list:
+    """Read just the header line of a (possibly compressed) CSV."""
+    with opener() as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        return next(csv.reader(text), [])
+
+
+def read_raw_chunks(opener, rename: dict, chunksize: int = CHUNK_ROWS):
+    """Stream canonical-schema chunks out of a raw CSV."""
+    with opener() as raw:
+        reader = pd.read_csv(raw, chunksize=chunksize, encoding="utf-8-sig", usecols=list(rename))
+        for chunk in reader:
+            yield chunk.rename(columns=rename)
@@ -0,0 +1,282 @@
+# What-if simulator for truck rebalancing over the historical AVAILABLE_BIKES timeline.
+#
+# Each station's history is put on a shared 30-minute grid. A simulated station follows the
+# historical demand (the step-to-step change in AVAILABLE_BIKES), but starts from whatever the
+# trucks left behind, and is clipped to [0, usable docks]: when the simulated station is empty the
+# historical pick-ups that would have taken it below zero are lost, and likewise for returns to a
+# full station.
+#
+# Each slot is scored first, then the truck acts, so a station that hits a threshold is always
+# counted for at least that slot. A station triggers when it is at or below low_threshold bikes
+# or at or below high_threshold free stands. A policy's truck runs at its scheduled times (every
+# slot when run_hours is None). On a run it serves stations that triggered response_lag slots
+# earlier and are still off target, moving them back towards target_fill of the usable docks,
+# most urgent first.
+#
+# The truck carries at most truck_capacity bikes and starts with initial_load on board. On each
+# run it first collects bikes from over-full stations, up to its free space, and then delivers
+# only the bikes it is carrying. Its load carries over between runs, so bikes added to empty
+# stations must come from full ones (or from the initial load).
+#
+# The simulation steps through time once per batch of policies, with every policy x station
+# updated together as (policy, station) arrays, and batches run in parallel worker processes.
+# Results are reported with the existing metrics: P(near empty) = P(bikes <= 2) and
+# P(near full) = P(free stands <= 2) over observed snapshots, before and after.
+#
+#     python rebalancing_simulator.py --low 1 2 --target 0.4 0.5 --truck 10 20 --schedule any 6,15
+
+import os
+import argparse
+import itertools
+from typing import NamedTuple, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from time_features import NEAR_EMPTY_THRESHOLD, NEAR_FULL_THRESHOLD, station_slot_grid
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+
+INPUT_CSV = "combined_cleaned_near_accommodation.csv"
+BATCH_SIZE = 32   # policies simulated together in one pass over the timeline
+
+
+class Policy(NamedTuple):
+    low_threshold: int = 2                      # top up at or below this many bikes
+    high_threshold: int = 2                     # clear at or below this many free stands
+    target_fill: float = 0.5                    # refill / clear towards this share of usable docks
+    truck_capacity: int = 20                    # bikes the truck can carry
+    run_hours: Optional[Tuple[int, ...]] = None  # scheduled run hours; None = respond every slot
+    response_lag: int = 0                       # slots between a trigger and the truck acting on it
+    initial_load: int = 0                       # bikes on the truck at the start
+
+    @property
+    def name(self) -> str:
+        schedule = "any" if self.run_hours is None else ",".join(str(h) for h in self.run_hours)
+        return (
+            f"low{self.low_threshold}_high{self.high_threshold}_fill{self.target_fill}"
+            f"_truck{self.truck_capacity}_runs{schedule}_lag{self.response_lag}_load{self.initial_load}"
+        )
+
+
+def build_grid(df: pd.DataFrame) -> dict:
+    """Station x slot arrays of bikes and usable docks on a shared 30-minute grid."""
+    df = df.assign(usable=df["AVAILABLE_BIKES"] + df["AVAILABLE_BIKE_STANDS"])
+    slots, frames = station_slot_grid(df, ["AVAILABLE_BIKES", "usable"])
+    bikes, usable = frames["AVAILABLE_BIKES"], frames["usable"]
+
+    observed = bikes.notna().to_numpy()
+    # Carry the last known state across gaps (and back-fill before a station's first snapshot)
+    bikes_filled = bikes.ffill(axis=1).bfill(axis=1).to_numpy(dtype=float)
+    usable_filled = usable.ffill(axis=1).bfill(axis=1).to_numpy(dtype=float)
+    demand = np.diff(bikes_filled, axis=1, prepend=bikes_filled[:, :1])
+
+    return {
+        "stations": bikes.index.to_numpy(),
+        "slots": slots,
+        "bikes": bikes_filled,
+        "usable": usable_filled,
+        "demand": demand,
+        "observed": observed,
+    }
+
+
+def run_mask(policies, slots: pd.DatetimeIndex) -> np.ndarray:
+    """(policy, slot) boolean: whether each policy's truck runs in each slot."""
+    mask = np.zeros((len(policies), len(slots)), dtype=bool)
+    on_the_hour = slots.minute == 0
+    for i, policy in enumerate(policies):
+        if policy.run_hours is None:
+            mask[i] = True
+        else:
+            mask[i] = on_the_hour & np.isin(slots.hour, policy.run_hours)
+    return mask
+
+
+def allocate(need: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Share each policy's truck capacity over its stations, largest need first."""
+    order = np.argsort(-need, axis=1, kind="stable")
+    sorted_need = np.take_along_axis(need, order, axis=1)
+    before = np.cumsum(sorted_need, axis=1) - sorted_need
+    sorted_alloc = np.clip(capacity[:, None] - before, 0, sorted_need)
+    alloc = np.empty_like(need)
+    np.put_along_axis(alloc, order, sorted_alloc, axis=1)
+    return alloc
+
+
+def simulate_batch(grid: dict, policies) -> dict:
+    """Replay the timeline once for a batch of policies; returns (policy, station) counters."""
+    n_policies = len(policies)
+    low = np.array([p.low_threshold for p in policies], dtype=float)[:, None]
+    high = np.array([p.high_threshold for p in policies], dtype=float)[:, None]
+    fill = np.array([p.target_fill for p in policies], dtype=float)[:, None]
+    capacity = np.array([p.truck_capacity for p in policies], dtype=float)
+    lag = np.array([p.response_lag for p in policies], dtype=int)
+    load = np.minimum([p.initial_load for p in policies], capacity).astype(float)
+    runs = run_mask(policies, grid["slots"])
+
+    bikes, usable, demand, observed = grid["bikes"], grid["usable"], grid["demand"], grid["observed"]
+    n_stations, n_slots = bikes.shape
+
+    sim = np.repeat(bikes[None, :, 0], n_policies, axis=0)
+    near_empty = np.zeros((n_policies, n_stations))
+    near_full = np.zeros((n_policies, n_stations))
+    added = np.zeros((n_policies, n_stations))
+    removed = np.zeros((n_policies, n_stations))
+
+    # Ring buffers of past triggers, so each policy can act on the ones from response_lag slots ago
+    history = lag.max() + 1
+    low_triggers = np.zeros((history, n_policies, n_stations), dtype=bool)
+    high_triggers = np.zeros((history, n_policies, n_stations), dtype=bool)
+    policy_rows = np.arange(n_policies)
+
+    for t in range(n_slots):
+        docks = usable[:, t]
+        sim = np.clip(sim + demand[:, t], 0, docks)
+
+        # Score the slot as users found it, before any truck arrives
+        seen = observed[:, t]
+        near_empty += seen & (sim <= NEAR_EMPTY_THRESHOLD)
+        near_full += seen & (docks - sim <= NEAR_FULL_THRESHOLD)
+
+        low_triggers[t % history] = sim <= low
+        high_triggers[t % history] = docks - sim <= high
+
+        active = runs[:, t] & (t >= lag)
+        if active.any():
+            past = (t - lag) % history
+            target = np.floor(fill * docks)
+            clear = active[:, None] & high_triggers[past, policy_rows]
+            top_up = active[:, None] & low_triggers[past, policy_rows]
+
+            # Collect first, into the truck's free space, then deliver what is on board
+            remove = allocate(np.where(clear, np.maximum(sim - target, 0), 0), capacity - load)
+            load += remove.sum(axis=1)
+            add = allocate(np.where(top_up, np.maximum(target - sim, 0), 0), load)
+            load -= add.sum(axis=1)
+
+            sim = sim + add - remove
+            added += add
+            removed += remove
+
+    return {"near_empty": near_empty, "near_full": near_full, "added": added, "removed": removed}
+
+
+def _simulate_batch_job(args):
+    return simulate_batch(*args)
+
+
+def simulate(grid: dict, policies, workers: int = 0, batch_size: int = BATCH_SIZE) -> pd.DataFrame:
+    """
+    Per policy x station: baseline and simulated P(near empty) / P(near full), their change, and
+    the bikes the trucks moved.
+    """
+    batches = [policies[i:i + batch_size] for i in range(0, len(policies), batch_size)]
+    jobs = [(grid, batch) for batch in batches]
+    if workers > 0 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_batch_job, jobs))
+    else:
+        results = [_simulate_batch_job(job) for job in jobs]
+    counters = {k: np.concatenate([r[k] for r in results]) for k in results[0]}
+
+    n = grid["observed"].sum(axis=1)
+    observed_bikes = np.where(grid["observed"], grid["bikes"], np.nan)
+    observed_free = np.where(grid["observed"], grid["usable"] - grid["bikes"], np.nan)
+    baseline_empty = (observed_bikes <= NEAR_EMPTY_THRESHOLD).sum(axis=1) / n
+    baseline_full = (observed_free <= NEAR_FULL_THRESHOLD).sum(axis=1) / n
+    days = len(grid["slots"]) / 48
+
+    n_policies, n_stations = counters["near_empty"].shape
+    result = pd.DataFrame({
+        "policy": np.repeat([p.name for p in policies], n_stations),
+        "STATION ID": np.tile(grid["stations"], n_policies),
+        "n": np.tile(n, n_policies),
+        "near_empty_baseline": np.tile(baseline_empty, n_policies),
+        "near_empty_simulated": (counters["near_empty"] / n).ravel(),
+        "near_full_baseline": np.tile(baseline_full, n_policies),
+        "near_full_simulated": (counters["near_full"] / n).ravel(),
+        "bikes_added_per_day": (counters["added"] / days).ravel(),
+        "bikes_removed_per_day": (counters["removed"] / days).ravel(),
+    })
+    result["near_empty_change"] = result["near_empty_simulated"] - result["near_empty_baseline"]
+    result["near_full_change"] = result["near_full_simulated"] - result["near_full_baseline"]
+    return result
+
+
+def summarise_policies(result: pd.DataFrame) -> pd.DataFrame:
+    """Pool stations per policy (weighted by observed snapshots)."""
+    weighted = result.assign(**{
+        col: result[col] * result["n"]
+        for col in ["near_empty_baseline", "near_empty_simulated", "near_full_baseline", "near_full_simulated"]
+    })
+    summary = weighted.groupby("policy").sum(numeric_only=True)
+    for col in ["near_empty_baseline", "near_empty_simulated", "near_full_baseline", "near_full_simulated"]:
+        summary[col] = summary[col] / summary["n"]
+    summary["near_empty_change"] = summary["near_empty_simulated"] - summary["near_empty_baseline"]
+    summary["near_full_change"] = summary["near_full_simulated"] - summary["near_full_baseline"]
+    summary = summary.drop(columns=["STATION ID", "n"])
+    return summary.sort_values("near_empty_change").reset_index()
+
+
+def policy_grid(lows, highs, fills, trucks, schedules, lags=(0,), initial_loads=(0,)):
+    """Cartesian product of policy parameters; schedules are "any" or comma-separated hours."""
+    run_hours = [None if s == "any" else tuple(int(h) for h in s.split(",")) for s in schedules]
+    combos = itertools.product(lows, highs, fills, trucks, run_hours, lags, initial_loads)
+    return [Policy(*combo) for combo in combos]
+
+
+def plot_policy_tradeoff(summary: pd.DataFrame, filename: str):
+    import matplotlib.pyplot as plt
+
+    moved = summary["bikes_added_per_day"] + summary["bikes_removed_per_day"]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.scatter(moved, -summary["near_empty_change"], label="near empty", color="tab:red", alpha=0.7)
+    ax.scatter(moved, -summary["near_full_change"], label="near full", color="tab:blue", alpha=0.7)
+    ax.set_xlabel("Bikes moved per day (all stations)")
+    ax.set_ylabel("Reduction in probability")
+    ax.set_title("Rebalancing policies: reduction in near-empty / near-full probability vs effort")
+    ax.legend()
+    fig.tight_layout()
+    os.makedirs("graphs", exist_ok=True)
+    fig.savefig(os.path.join("graphs", filename))
+    plt.close(fig)
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Rebalancing what-if simulator"))
+    parser.add_argument("input_csv", nargs="?", default=INPUT_CSV, help="e.g. combined_cleaned.csv for the Trinity stations")
+    parser.add_argument("--low", type=int, nargs="+", default=[2], help="top-up thresholds (bikes)")
+    parser.add_argument("--high", type=int, nargs="+", default=[2], help="clear thresholds (free stands)")
+    parser.add_argument("--target", type=float, nargs="+", default=[0.5], help="target fill shares")
+    parser.add_argument("--truck", type=int, nargs="+", default=[20], help="truck capacities (bikes carried)")
+    parser.add_argument("--schedule", nargs="+", default=["any"], help='"any" or run hours such as 6,15')
+    parser.add_argument("--lag", type=int, nargs="+", default=[0], help="response lags (30-minute slots)")
+    parser.add_argument("--initial-load", type=int, nargs="+", default=[0], help="bikes on the truck at the start")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parse_export_args(parser=parser)
+
+    df = pd.read_csv(args.input_csv)
+    if args.exclude_anomalies:
+        # Dropped days become gaps: the simulation carries its state across them unscored
+        df = drop_anomalous_days(df)
+    grid = build_grid(df)
+    policies = policy_grid(args.low, args.high, args.target, args.truck, args.schedule, args.lag, args.initial_load)
+    print(f"Simulating {len(policies)} policies over {grid['bikes'].shape[0]} stations x {grid['bikes'].shape[1]} slots")
+
+    result = simulate(grid, policies, workers=args.workers)
+    summary = summarise_policies(result)
+    print(summary[["policy", "near_empty_baseline", "near_empty_simulated", "near_full_baseline", "near_full_simulated"]].head(10).to_string(index=False))
+
+    if args.export:
+        export_tables({"rebalancing_by_station": result, "rebalancing_by_policy": summary}, args.export)
+    if args.headless:
+        return
+
+    plot_policy_tradeoff(summary, "rebalancing_policy_tradeoff.png")
+    print("Graph saved to ./graphs/rebalancing_policy_tradeoff.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Sorted (station, TIME) index over the cleaned snapshot data.
+#
+# The data is sorted once by station then time, and a per-station offset table records where
+# each station's rows start and end. Selecting a station and/or time range is then a binary
+# search on the sorted TIME column followed by a contiguous slice: O(log n + k) instead of the
+# O(n) boolean scans like df[(df['STATION ID'] == station_id) & (df['TIME'].dt.month == 1)].
+#
+# Building the index (parsing TIME and sorting) costs more than a single scan, so
+# load_station_index keeps the parsed, sorted frame in a pickle next to the CSV
+# (combined_cleaned.csv -> combined_cleaned.sorted.pkl) and reuses it until the CSV changes.
+#
+# Usage:
+#     index = load_station_index('combined_cleaned.csv', exclude_anomalies=args.exclude_anomalies)
+#     january = index.month(station_id=21, year=2023, month=1)
+#     spring = index.select(station_id=21, start='2023-03-01', end='2023-06-01')
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from anomaly_detection import drop_anomalous_days
+
+
+def is_station_time_sorted(df: pd.DataFrame) -> bool:
+    """Whether rows are ordered by STATION ID, then TIME within each station."""
+    station = df["STATION ID"].to_numpy()
+    times = df["TIME"].to_numpy()
+    same = station[1:] == station[:-1]
+    return bool(np.all((station[1:] > station[:-1]) | (same & (times[1:] >= times[:-1]))))
+
+
+class StationTimeIndex:
+    def __init__(self, df: pd.DataFrame):
+        if not pd.api.types.is_datetime64_any_dtype(df["TIME"]):
+            df = df.assign(TIME=pd.to_datetime(df["TIME"]))
+        # clean_data.py writes its output sorted by (station, time); only sort when it isn't
+        if not is_station_time_sorted(df):
+            df = df.sort_values(["STATION ID", "TIME"], kind="mergesort")
+        self.df = df.reset_index(drop=True)
+        df = self.df
+        self.times = df["TIME"].to_numpy()
+
+        station_ids, starts = np.unique(df["STATION ID"].to_numpy(), return_index=True)
+        ends = np.append(starts[1:], len(df))
+        self.offsets = {int(s): (int(a), int(b)) for s, a, b in zip(station_ids, starts, ends)}
+
+    @property
+    def stations(self):
+        return list(self.offsets)
+
+    def bounds(self, station_id, start=None, end=None):
+        """Row range [lo, hi) for one station with start <= TIME < end."""
+        lo, hi = self.offsets.get(int(station_id), (0, 0))
+        times = self.times[lo:hi]
+        if start is not None:
+            lo_off = np.searchsorted(times, np.datetime64(pd.Timestamp(start)), side="left")
+        else:
+            lo_off = 0
+        if end is not None:
+            hi_off = np.searchsorted(times, np.datetime64(pd.Timestamp(end)), side="left")
+        else:
+            hi_off = len(times)
+        return lo + lo_off, lo + hi_off
+
+    def select(self, station_id=None, start=None, end=None) -> pd.DataFrame:
+        """Rows for one station (or every station) with start <= TIME < end."""
+        if station_id is not None:
+            lo, hi = self.bounds(station_id, start, end)
+            return self.df.iloc[lo:hi]
+        slices = [self.df.iloc[slice(*self.bounds(s, start, end))] for s in self.offsets]
+        return pd.concat(slices) if slices else self.df.iloc[0:0]
+
+    def year(self, station_id=None, year: int = None) -> pd.DataFrame:
+        return self.select(station_id, f"{year}-01-01", f"{year + 1}-01-01")
+
+    def month(self, station_id=None, year: int = None, month: int = None) -> pd.DataFrame:
+        start = pd.Timestamp(year=year, month=month, day=1)
+        return self.select(station_id, start, start + pd.offsets.MonthBegin(1))
+
+
+def sorted_cache_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".sorted.pkl"
+
+
+def read_sorted(path: str) -> pd.DataFrame:
+    """The CSV with TIME parsed, sorted by (station, time); cached beside it until the CSV changes."""
+    cache = sorted_cache_path(path)
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        return pd.read_pickle(cache)
+    df = StationTimeIndex(pd.read_csv(path)).df
+    # Write to a temp file and swap it in so a concurrent run never reads a half-written cache
+    tmp_path = cache + ".tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache)
+    return df
+
+
+def load_station_index(path: str, exclude_anomalies: bool = False) -> StationTimeIndex:
+    df = read_sorted(path)
+    if exclude_anomalies:
+        df = drop_anomalous_days(df)
+    return StationTimeIndex(df)
@@ -0,0 +1,61 @@
+# Headless table export shared by the analysis scripts.
+#
+# Every analysis script accepts:
+#     --export {csv,json,pickle}   write the computed tables to ./tables
+#     --headless                   skip the PNGs (and never import matplotlib); exports csv unless
+#                                  --export says otherwise
+#
+# e.g. python availability_probability_analysis.py --headless --export json
+#
+# Scripts import matplotlib.pyplot inside their plotting functions, never at module level, so that
+# --headless runs (and modules that only import a script's helpers) don't load it.
+
+import os
+import argparse
+
+import pandas as pd
+
+TABLES_DIR = "tables"
+
+EXPORT_FORMATS = {
+    "csv": ".csv",
+    "json": ".json",
+    "pickle": ".pkl",
+}
+
+
+def add_export_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument("--export", choices=sorted(EXPORT_FORMATS), help="write computed tables to ./tables")
+    parser.add_argument("--headless", action="store_true", help="skip plotting; export tables only")
+    return parser
+
+
+def parse_export_args(description: str = None, parser: argparse.ArgumentParser = None):
+    parser = parser or argparse.ArgumentParser(description=description)
+    args = add_export_arguments(parser).parse_args()
+    if args.headless and args.export is None:
+        args.export = "csv"
+    return args
+
+
+def export_table(df: pd.DataFrame, name: str, fmt: str, out_dir: str = TABLES_DIR) -> str:
+    # Named or multi-level indexes (e.g. a pivot table) become ordinary columns
+    if not isinstance(df.index, pd.RangeIndex) or df.index.name is not None:
+        df = df.reset_index()
+    df = df.rename(columns=str)
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, name + EXPORT_FORMATS[fmt])
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records", date_format="iso", indent=1)
+    else:
+        df.to_pickle(path)
+    return path
+
+
+def export_tables(tables: dict, fmt: str, out_dir: str = TABLES_DIR):
+    for name, df in tables.items():
+        path = export_table(df, name, fmt, out_dir)
+        print(f"Saved table: {path}")
@@ -0,0 +1,109 @@
+# Time labels shared by the availability analyses: event thresholds, hour bins, bank holidays, the
+# vectorized labelling used by add_time_features and the shared station x slot grid. Library
+# modules (chunked_aggregates, approximate_queries, occupancy_timeline, ...) import these from here
+# rather than from the analysis scripts.
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Thresholds for events of interest
+NEAR_EMPTY_THRESHOLD = 2  # bikes remaining
+NEAR_FULL_THRESHOLD = 2   # free stands remaining
+
+SLOT = "30min"  # snapshot interval, and the step of the station x slot grid
+
+# Hour bins for temporal analysis
+HOUR_BINS = [
+    ("morning_peak", 7, 10),
+    ("midday", 11, 15),
+    ("evening_peak", 16, 19),
+    ("night", 20, 23),
+    ("overnight", 0, 6),
+]
+
+# Irish bank holidays for 2022-2023 (inclusive)
+BANK_HOLIDAYS = {
+    # 2022
+    date(2022, 1, 3),  # New Year (observed)
+    date(2022, 3, 17), # St Patrick's Day
+    date(2022, 3, 18), # 2022 one-off bank holiday
+    date(2022, 4, 18), # Easter Monday
+    date(2022, 5, 2),  # May Day
+    date(2022, 6, 6),  # June bank holiday
+    date(2022, 8, 1),  # August bank holiday
+    date(2022, 10, 31),# October bank holiday
+    date(2022, 12, 26),# St Stephen's Day
+    date(2022, 12, 27),# Christmas (observed)
+    # 2023
+    date(2023, 1, 2),
+    date(2023, 3, 17),
+    date(2023, 4, 10),
+    date(2023, 5, 1),
+    date(2023, 6, 5),
+    date(2023, 8, 7),
+    date(2023, 10, 30),
+    date(2023, 12, 25),
+    date(2023, 12, 26),
+}
+
+
+
+
+def assign_hour_bin(ts: pd.Timestamp) -> str:
+    """Map an hour to a named bin."""
+    hour = ts.hour
+    for name, start, end in HOUR_BINS:
+        if start <= end and start <= hour <= end:
+            return name
+        if start > end and (hour >= start or hour <= end):
+            return name
+    return "other"
+
+
+# assign_hour_bin for every hour of the day, so whole columns can be labelled by lookup
+HOUR_BIN_BY_HOUR = np.array([assign_hour_bin(pd.Timestamp(2000, 1, 1, hour)) for hour in range(24)], dtype=object)
+
+BANK_HOLIDAY_DATES = pd.to_datetime(sorted(BANK_HOLIDAYS))
+
+
+def label_hour_bins(times) -> np.ndarray:
+    """Hour-bin name for each timestamp."""
+    return HOUR_BIN_BY_HOUR[pd.DatetimeIndex(times).hour]
+
+
+def label_day_category(times) -> np.ndarray:
+    """weekday / weekend / bank_holiday for each timestamp."""
+    times = pd.DatetimeIndex(times)
+    category = np.where(times.weekday < 5, "weekday", "weekend").astype(object)
+    category[times.normalize().isin(BANK_HOLIDAY_DATES)] = "bank_holiday"
+    return category
+
+
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    df["date"] = df["TIME"].dt.date
+    df["hour_bin"] = label_hour_bins(df["TIME"])
+    df["day_category"] = label_day_category(df["TIME"])
+    df["peak_status"] = np.where(df["hour_bin"].isin(["morning_peak", "evening_peak"]), "peak", "off_peak")
+    df["near_empty"] = df["AVAILABLE_BIKES"] <= NEAR_EMPTY_THRESHOLD
+    df["near_full"] = df["AVAILABLE_BIKE_STANDS"] <= NEAR_FULL_THRESHOLD
+    return df
+
+
+def station_slot_grid(df: pd.DataFrame, columns, freq: str = SLOT):
+    """
+    Station x slot frames of the given columns on one shared grid: snapshots are rounded to the
+    nearest slot, the last one in a slot wins, and unobserved slots are NaN.
+    Returns the grid's slots and {column: frame}.
+    """
+    columns = list(columns)
+    df = df[["STATION ID", "TIME"] + columns].copy()
+    df["slot"] = pd.to_datetime(df["TIME"]).dt.round(freq)
+    df = df.drop_duplicates(["STATION ID", "slot"], keep="last")
+
+    slots = pd.date_range(df["slot"].min(), df["slot"].max(), freq=freq)
+    frames = {c: df.pivot(index="STATION ID", columns="slot", values=c).reindex(columns=slots) for c in columns}
+    return slots, frames
@@ -1,60 +1,130 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 
-# -----------------------------
-# Load data
-# -----------------------------
-df = pd.read_csv('combined_cleaned.csv')
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+from chunked_aggregates import add_chunked_arguments, chunked_mean_fraction_by_slot
+from approximate_queries import (
+    add_approximate_arguments,
+    add_strata_columns,
+    slot_label,
+    StratifiedSample,
+    stratified_estimates,
+    run_approximate,
+    describe_sample,
+)
 
-# -----------------------------
-# Select station + year
-# -----------------------------
-station_id = 21   # change as needed
-year = 2023
 
-station_data = df[(df['STATION ID'] == station_id) & (df['YEAR'] == year)]
+def mean_fraction_by_slot(df: pd.DataFrame, station_id: int, year: int) -> pd.Series:
+    # -----------------------------
+    # Select station + year
+    # -----------------------------
+    station_data = df[(df['STATION ID'] == station_id) & (df['YEAR'] == year)].copy()
 
-# Convert TIME column to datetime
-station_data['TIME'] = pd.to_datetime(station_data['TIME'])
+    # Convert TIME column to datetime
+    station_data['TIME'] = pd.to_datetime(station_data['TIME'])
+
+    # -----------------------------
+    # Fraction of bikes docked
+    # -----------------------------
+    station_data["frac_docked"] = (
+        station_data["AVAILABLE_BIKES"] / station_data["BIKE_STANDS"]
+    )
+
+    # -----------------------------
+    # Extract 30‑minute time-of-day slot
+    # -----------------------------
+    station_data["time_of_day"] = station_data["TIME"].dt.strftime("%H:%M")
+
+    # -----------------------------
+    # Compute mean fraction docked for each 30‑minute slot
+    # -----------------------------
+    mean_frac = station_data.groupby("time_of_day")["frac_docked"].mean()
+
+    # Sort by actual time order
+    return mean_frac.sort_index()
+
+
+def approximate_mean_fraction_by_slot(df: pd.DataFrame, station_id: int, year: int, args) -> pd.DataFrame:
+    # Same selection as mean_fraction_by_slot, estimated from a stratified sample
+    station_data = df[(df['STATION ID'] == station_id) & (df['YEAR'] == year)]
+    sampler = StratifiedSample(add_strata_columns(station_data), seed=args.seed)
+
+    def estimate(sample):
+        sample = sample.assign(
+            frac_docked=sample["AVAILABLE_BIKES"] / sample["BIKE_STANDS"],
+            time_of_day=slot_label(sample["slot"]),
+        )
+        return {"time_of_day": stratified_estimates(sample, "frac_docked", ["time_of_day"], sampler.sizes, name="frac_docked")}
+
+    estimates, info = run_approximate(sampler, estimate, args.target_error, args.time_budget, args.sample_fraction)
+    print(describe_sample(info, args.target_error))
+    return estimates["time_of_day"].set_index("time_of_day")
+
+
+def plot_mean_fraction(mean_frac: pd.Series, station_id: int, year: int, errors: pd.Series = None) -> str:
+    import matplotlib.pyplot as plt
+
+    # -----------------------------
+    # Plotting (Histogram / Bar Chart)
+    # -----------------------------
+    fig, ax = plt.subplots(figsize=(14, 6))
+    ax.bar(mean_frac.index, mean_frac.values, yerr=None if errors is None else errors.values, capsize=3, width=0.8)
+
+    ax.set_xlabel("Time of Day (30‑minute intervals)")
+    ax.set_ylabel("Mean Fraction of Bikes Docked")
+    ax.set_title(f"Mean Fraction of Bikes Docked by 30‑Minute Interval\nStation {station_id} — Year {year}")
+
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+
+    # Save graph
+    os.makedirs("graphs", exist_ok=True)
+    path = f"graphs/station_{station_id}_mean_fraction_docked_{year}.png"
+    fig.savefig(path)
+    plt.close(fig)
+    return path
 
-# -----------------------------
-# Fraction of bikes docked
-# -----------------------------
-station_data["frac_docked"] = (
-    station_data["AVAILABLE_BIKES"] / station_data["BIKE_STANDS"]
-)
 
-# -----------------------------
-# Extract 30‑minute time-of-day slot
-# -----------------------------
-station_data["time_of_day"] = station_data["TIME"].dt.strftime("%H:%M")
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description="Mean fraction docked by 30-minute slot for one station"))
+    add_chunked_arguments(parser)
+    add_approximate_arguments(parser)
+    args = parse_export_args(parser=parser)
+    if args.chunked and args.exclude_anomalies:
+        parser.error('--exclude-anomalies needs the whole dataset in memory; drop --chunked')
+    if args.chunked and args.approximate:
+        parser.error('--approximate samples the dataset in memory; drop --chunked')
 
-# -----------------------------
-# Compute mean fraction docked for each 30‑minute slot
-# -----------------------------
-mean_frac = station_data.groupby("time_of_day")["frac_docked"].mean()
+    station_id = 21   # change as needed
+    year = 2023
 
-# Sort by actual time order
-mean_frac = mean_frac.sort_index()
+    if args.chunked:
+        mean_frac = chunked_mean_fraction_by_slot('combined_cleaned.csv', station_id, year, args.memory_limit_mb, args.workers)
+    else:
+        # -----------------------------
+        # Load data
+        # -----------------------------
+        df = pd.read_csv('combined_cleaned.csv')
+        if args.exclude_anomalies:
+            df = drop_anomalous_days(df)
 
-# -----------------------------
-# Plotting (Histogram / Bar Chart)
-# -----------------------------
-fig, ax = plt.subplots(figsize=(14, 6))
-ax.bar(mean_frac.index, mean_frac.values, width=0.8)
+        if args.approximate:
+            estimates = approximate_mean_fraction_by_slot(df, station_id, year, args)
+            mean_frac, errors = estimates["frac_docked"], estimates["half_width"]
+        else:
+            mean_frac = mean_fraction_by_slot(df, station_id, year)
 
-ax.set_xlabel("Time of Day (30‑minute intervals)")
-ax.set_ylabel("Mean Fraction of Bikes Docked")
-ax.set_title(f"Mean Fraction of Bikes Docked by 30‑Minute Interval\nStation {station_id} — Year {year}")
+    if args.export:
+        table = estimates if args.approximate else mean_frac.rename("frac_docked").to_frame()
+        export_tables({f"station_{station_id}_mean_fraction_docked_{year}": table}, args.export)
+    if args.headless:
+        return
 
-plt.xticks(rotation=90)
-plt.tight_layout()
+    path = plot_mean_fraction(mean_frac, station_id, year, errors if args.approximate else None)
+    print(f"Saved yearly histogram: {path}")
 
-# Save graph
-os.makedirs("graphs", exist_ok=True)
-path = f"graphs/station_{station_id}_mean_fraction_docked_{year}.png"
-fig.savefig(path)
-plt.close(fig)
 
-print(f"Saved yearly histogram: {path}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
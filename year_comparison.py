@@ -1,40 +1,81 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 
-# Load and preprocess
-df = pd.read_csv('combined_cleaned.csv')
-df['TIME'] = pd.to_datetime(df['TIME'])
-df['frac_not_docked'] = (df['BIKE_STANDS'] - df['AVAILABLE_BIKES']) / df['BIKE_STANDS']
+from table_export import parse_export_args, export_tables
+from anomaly_detection import add_anomaly_arguments, drop_anomalous_days
+from chunked_aggregates import add_chunked_arguments, chunked_station_means
 
-# Compute mean usage per station per year
-station_means = df.groupby(['YEAR', 'STATION ID'])['frac_not_docked'].mean().reset_index()
 
-# Pivot so each station has columns for 2022 and 2023
-pivot_means = station_means.pivot(index='STATION ID', columns='YEAR', values='frac_not_docked')
+def compute_station_means(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df['TIME'] = pd.to_datetime(df['TIME'])
+    df['frac_not_docked'] = (df['BIKE_STANDS'] - df['AVAILABLE_BIKES']) / df['BIKE_STANDS']
 
-# Sort by 2023 usage (optional, makes chart easier to read)
-pivot_means = pivot_means.sort_values(by=2023, ascending=False)
+    # Compute mean usage per station per year
+    station_means = df.groupby(['YEAR', 'STATION ID'])['frac_not_docked'].mean().reset_index()
+    return pivot_station_means(station_means)
 
-# Plot side-by-side bars
-fig, ax = plt.subplots(figsize=(14, 6))
-x = range(len(pivot_means))
 
-ax.bar([i - 0.2 for i in x], pivot_means[2022], width=0.4, label='2022')
-ax.bar([i + 0.2 for i in x], pivot_means[2023], width=0.4, label='2023')
+def pivot_station_means(station_means: pd.DataFrame) -> pd.DataFrame:
+    # Pivot so each station has columns for 2022 and 2023
+    pivot_means = station_means.pivot(index='STATION ID', columns='YEAR', values='frac_not_docked')
 
-ax.set_xticks(x)
-ax.set_xticklabels(pivot_means.index.astype(str), rotation=90)
-ax.set_xlabel('Station ID')
-ax.set_ylabel('Mean Fraction of Bikes Not Docked (in use)')
-ax.set_title('Mean Bike Usage per Station: 2022 vs 2023')
-ax.legend()
-fig.tight_layout()
+    # Sort by 2023 usage (optional, makes chart easier to read)
+    return pivot_means.sort_values(by=2023, ascending=False)
 
-# Save
-os.makedirs('graphs', exist_ok=True)
-path = 'graphs/station_mean_usage_comparison.png'
-fig.savefig(path)
-plt.close(fig)
 
-print(f"Saved comparison graph: {path}")
\ No newline at end of file
+def plot_comparison(pivot_means: pd.DataFrame) -> str:
+    import matplotlib.pyplot as plt
+
+    # Plot side-by-side bars
+    fig, ax = plt.subplots(figsize=(14, 6))
+    x = range(len(pivot_means))
+
+    ax.bar([i - 0.2 for i in x], pivot_means[2022], width=0.4, label='2022')
+    ax.bar([i + 0.2 for i in x], pivot_means[2023], width=0.4, label='2023')
+
+    ax.set_xticks(x)
+    ax.set_xticklabels(pivot_means.index.astype(str), rotation=90)
+    ax.set_xlabel('Station ID')
+    ax.set_ylabel('Mean Fraction of Bikes Not Docked (in use)')
+    ax.set_title('Mean Bike Usage per Station: 2022 vs 2023')
+    ax.legend()
+    fig.tight_layout()
+
+    # Save
+    os.makedirs('graphs', exist_ok=True)
+    path = 'graphs/station_mean_usage_comparison.png'
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def main():
+    parser = add_anomaly_arguments(argparse.ArgumentParser(description='Mean bike usage per station: 2022 vs 2023'))
+    add_chunked_arguments(parser)
+    args = parse_export_args(parser=parser)
+    if args.chunked and args.exclude_anomalies:
+        parser.error('--exclude-anomalies needs the whole dataset in memory; drop --chunked')
+
+    if args.chunked:
+        station_means = chunked_station_means('combined_cleaned.csv', args.memory_limit_mb, args.workers)
+        pivot_means = pivot_station_means(station_means)
+    else:
+        # Load and preprocess
+        df = pd.read_csv('combined_cleaned.csv')
+        if args.exclude_anomalies:
+            df = drop_anomalous_days(df)
+        pivot_means = compute_station_means(df)
+
+    if args.export:
+        export_tables({'station_mean_usage_by_year': pivot_means}, args.export)
+    if args.headless:
+        return
+
+    path = plot_comparison(pivot_means)
+    print(f"Saved comparison graph: {path}")
+
+
+if __name__ == '__main__':
+    main()